@@ -4,14 +4,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from typing import List, Optional
 from uuid import UUID
-import json
+import anyio
 import logging
+import orjson
 from datetime import datetime
 
 from app.core.database import get_async_session
 from app.core.security import get_current_user
 from app.models import User
 from app.models.chat import ChatSession, ChatMessage, ChatContext, MessageFeedback
+from app.services.unified_llm_service import UnifiedLLMService, get_llm_service
+from app.services.stream_buffer import bounded_generator
 from app.schemas.chat import (
     ChatSessionCreate,
     ChatSessionResponse,
@@ -25,6 +28,26 @@ from app.schemas.chat import (
 
 router = APIRouter()
 
+def _sse_event(data: dict) -> bytes:
+    """Frame a payload as a single server-sent ``data:`` event"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+class _EventStreamResponse(StreamingResponse):
+    """StreamingResponse that always closes its event stream.
+    
+    On client disconnect Starlette cancels ``stream_response``, which can land
+    in ``send`` and leave the body generator suspended until it is garbage
+    collected. Closing it here, shielded from that cancellation, stops the
+    LLM producer while the request's database session is still open.
+    """
+    
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
 @router.post("/sessions", response_model=ChatSessionResponse)
 async def create_chat_session(
     session_data: ChatSessionCreate,
@@ -179,7 +202,8 @@ async def send_message(
     session_id: UUID,
     message_data: ChatMessageCreate,
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_async_session)
+    db: AsyncSession = Depends(get_async_session),
+    llm_service: UnifiedLLMService = Depends(get_llm_service)
 ):
     """Send a message and get streaming response."""
     # Verify session ownership
@@ -197,8 +221,6 @@ async def send_message(
     # Stream LLM response
     async def generate():
         try:
-            from app.services.unified_llm_service import get_llm_service
-            
             # Save user message
             user_message = ChatMessage(
                 session_id=str(session_id),
@@ -241,8 +263,7 @@ async def send_message(
                 "content": message_data.content
             })
             
-            # Get LLM service and stream response
-            llm_service = await get_llm_service()
+            # Stream response from the LLM service
             full_response = ""
             assistant_message = None
             
@@ -260,7 +281,7 @@ async def send_message(
                         'type': 'chunk',
                         'content': chunk.content
                     }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
+                    yield chunk_data
                     
                 elif chunk.type == "complete":
                     # Save assistant message to database
@@ -291,7 +312,7 @@ async def send_message(
                         'content': chunk.content if chunk.content else "",
                         'tokens': assistant_message.tokens or len(full_response.split())
                     }
-                    yield f"data: {json.dumps(completion)}\n\n"
+                    yield completion
                     break
                     
                 elif chunk.type == "error":
@@ -299,7 +320,7 @@ async def send_message(
                         'type': 'error',
                         'error': chunk.error
                     }
-                    yield f"data: {json.dumps(error_chunk)}\n\n"
+                    yield error_chunk
                     break
             
         except Exception as e:
@@ -310,16 +331,28 @@ async def send_message(
                 'type': 'error',
                 'error': f"Internal server error: {str(e)}"
             }
-            yield f"data: {json.dumps(error_chunk)}\n\n"
+            yield error_chunk
+    
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no"  # Disable Nginx buffering
+    }
     
-    return StreamingResponse(
-        generate(),
+    async def encode():
+        # Let the LLM stream run up to 64 events ahead of a slow client write
+        events = bounded_generator(generate(), max_in_flight=64)
+        try:
+            async for event in events:
+                yield _sse_event(event)
+        finally:
+            # Cancels the producer task if the client went away mid-stream
+            await events.aclose()
+    
+    return _EventStreamResponse(
+        encode(),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # Disable Nginx buffering
-        }
+        headers=headers
     )
 
 @router.get("/sessions/{session_id}/context", response_model=ContextResponse)
@@ -490,9 +523,10 @@ async def submit_message_feedback(
     )
 
 @router.get("/models")
-async def get_available_models():
+async def get_available_models(
+    llm_service: UnifiedLLMService = Depends(get_llm_service)
+):
     """Get list of available LLM models"""
-    llm_service = await get_llm_service()
     models = await llm_service.get_available_models()
     return {
         "models": models,
@@ -541,9 +575,10 @@ async def get_message_feedback(
     )
 
 @router.get("/models")
-async def get_available_models():
+async def get_available_models(
+    llm_service: UnifiedLLMService = Depends(get_llm_service)
+):
     """Get list of available LLM models"""
-    llm_service = await get_llm_service()
     models = await llm_service.get_available_models()
     return {
         "models": models,
@@ -1,6 +1,5 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine, AsyncEngine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy import MetaData, select
 from typing import AsyncGenerator
 import asyncio
@@ -87,7 +86,7 @@ def get_database_url_and_engine():
 database_url, engine = get_database_url_and_engine()
 
 # Create async session
-async_session_maker = sessionmaker(
+async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
@@ -108,9 +108,38 @@ class ChatContextUpdate(BaseModel):
 class StreamingResponse(BaseModel):
     type: str  # "chunk", "complete", "error"
     content: str = ""
+    message_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
+    # Streamed once per token, so the factories below skip validation via
+    # model_construct; callers are trusted to pass well-typed values
+
+    @classmethod
+    def chunk(
+        cls, content: str, metadata: Optional[Dict[str, Any]] = None
+    ) -> "StreamingResponse":
+        return cls.model_construct(
+            type="chunk", content=content, message_id=None, metadata=metadata, error=None
+        )
+
+    @classmethod
+    def complete(
+        cls,
+        content: str = "",
+        message_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> "StreamingResponse":
+        return cls.model_construct(
+            type="complete", content=content, message_id=message_id, metadata=metadata, error=None
+        )
+
+    @classmethod
+    def error_event(cls, error: str, content: str = "") -> "StreamingResponse":
+        return cls.model_construct(
+            type="error", content=content, message_id=None, metadata=None, error=error
+        )
+
 class ContextResponse(BaseModel):
     session_id: UUID
     summary: Optional[str] = None
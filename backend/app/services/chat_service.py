@@ -1,4 +1,5 @@
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator
+import asyncio
 import logging
 import json
 from datetime import datetime
@@ -18,6 +19,87 @@ from .context_manager import ContextManager
 
 logger = logging.getLogger(__name__)
 
+async def _coalesce(
+    stream: AsyncIterator[StreamingResponse],
+    max_chars: int = 512,
+    max_ms: float = 25
+) -> AsyncGenerator[StreamingResponse, None]:
+    """Merge adjacent chunk events to cut per-event send overhead.
+    
+    Chunk content is buffered until ``max_chars`` characters have arrived
+    or ``max_ms`` milliseconds have passed since the first buffered chunk,
+    then emitted as one chunk event. Any other event flushes the buffer
+    first so ordering is preserved. While nothing is buffered the upstream
+    is awaited directly; only while a flush deadline is pending is
+    ``__anext__`` wrapped in a task and awaited with ``asyncio.wait``
+    (rather than ``wait_for``), so a timeout never cancels (and thereby
+    closes) the upstream generator.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = stream.__aiter__()
+    buffer: List[str] = []
+    buffered = 0
+    deadline: Optional[float] = None
+    pending: Optional[asyncio.Future] = None
+    
+    def take() -> StreamingResponse:
+        nonlocal buffered, deadline
+        merged = StreamingResponse.chunk("".join(buffer))
+        buffer.clear()
+        buffered = 0
+        deadline = None
+        return merged
+    
+    try:
+        while True:
+            if pending is None and deadline is None:
+                # Nothing buffered, so no flush can come due while we wait
+                try:
+                    event = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                done, _ = await asyncio.wait((pending,), timeout=timeout)
+                
+                if not done:
+                    # Time threshold reached while waiting for the next event
+                    yield take()
+                    continue
+                
+                future, pending = pending, None
+                try:
+                    event = future.result()
+                except StopAsyncIteration:
+                    break
+            
+            if event.type == "chunk":
+                buffer.append(event.content)
+                buffered += len(event.content)
+                if deadline is None:
+                    deadline = loop.time() + max_ms / 1000
+                if buffered >= max_chars:
+                    yield take()
+                continue
+            
+            if buffer:
+                yield take()
+            yield event
+        
+        if buffer:
+            yield take()
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
 class ChatService:
     """Service for managing chat sessions and AI interactions"""
     
@@ -183,11 +265,7 @@ class ChatService:
             # Verify session and add user message
             session = await self.get_session(session_id, user_id)
             if not session:
-                yield StreamingResponse(
-                    type="error",
-                    content="",
-                    error="Session not found or access denied"
-                )
+                yield StreamingResponse.error_event("Session not found or access denied")
                 return
             
             # Add user message to database
@@ -235,13 +313,13 @@ class ChatService:
             llm_client = await get_llm_client()
             full_response = ""
             
-            async for chunk in llm_client.chat_completion(
+            async for chunk in _coalesce(llm_client.chat_completion(
                 messages=conversation,
                 model=model,
                 temperature=temperature,
                 max_tokens=max_tokens,
                 stream=True
-            ):
+            )):
                 if chunk.type == "chunk":
                     full_response += chunk.content
                     yield chunk
@@ -275,8 +353,7 @@ class ChatService:
                         )
                     
                     # Yield completion with message ID
-                    yield StreamingResponse(
-                        type="complete",
+                    yield StreamingResponse.complete(
                         content=chunk.content,
                         message_id=str(assistant_message.id),
                         metadata=chunk.metadata
@@ -288,11 +365,7 @@ class ChatService:
         
         except Exception as e:
             logger.error(f"Error streaming chat response: {str(e)}")
-            yield StreamingResponse(
-                type="error",
-                content="",
-                error=f"Internal server error: {str(e)}"
-            )
+            yield StreamingResponse.error_event(f"Internal server error: {str(e)}")
     
     async def _build_system_prompt(
         self, 
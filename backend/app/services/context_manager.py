@@ -8,22 +8,31 @@ from ..models.chat import ChatContext
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; extraction runs on every conversation turn
+_TASK_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"(?:need to|should|must|have to|going to|will)\s+([^.]+)",
+    r"(?:todo|to-do|task):\s*([^.]+)",
+    r"(?:action|step)\s*\d*:\s*([^.]+)",
+    r"(?:next|then|after that),?\s*([^.]+)",
+))
+
+_GOAL_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"(?:trying to|wanting to|need to|goal is to|objective is to|aim is to)\s+([^.]+)",
+    r"(?:working on|focusing on)\s+([^.]+)",
+    r"(?:problem|issue|challenge):\s*([^.]+)",
+))
+
+_NUMBERED_TASK_RE = re.compile(r"^\s*\d+\.\s*([^.]+)", re.IGNORECASE | re.MULTILINE)
+_BULLET_TASK_RE = re.compile(r"^\s*[-*]\s*([^.]+)", re.IGNORECASE | re.MULTILINE)
+_SENTENCE_SPLIT_RE = re.compile(r"[.!?]+")
+_WORD_RE = re.compile(r"\w+")
+
 class ContextManager:
     """Service for managing problem context and task extraction"""
     
     def __init__(self):
-        self.task_patterns = [
-            r"(?i)(?:need to|should|must|have to|going to|will)\s+([^.]+)",
-            r"(?i)(?:todo|to-do|task):\s*([^.]+)",
-            r"(?i)(?:action|step)\s*\d*:\s*([^.]+)",
-            r"(?i)(?:next|then|after that),?\s*([^.]+)",
-        ]
-        
-        self.goal_patterns = [
-            r"(?i)(?:trying to|wanting to|need to|goal is to|objective is to|aim is to)\s+([^.]+)",
-            r"(?i)(?:working on|focusing on)\s+([^.]+)",
-            r"(?i)(?:problem|issue|challenge):\s*([^.]+)",
-        ]
+        self.task_patterns = _TASK_PATTERNS
+        self.goal_patterns = _GOAL_PATTERNS
         
         self.priority_keywords = {
             "high": ["urgent", "critical", "important", "asap", "priority", "immediately"],
@@ -60,7 +69,7 @@ class ContextManager:
         tasks = []
         
         for pattern in self.task_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = pattern.findall(text)
             for match in matches:
                 task_text = match.strip()
                 if len(task_text) > 5:  # Filter out very short matches
@@ -72,7 +81,7 @@ class ContextManager:
                     })
         
         # Look for numbered lists
-        numbered_tasks = re.findall(r"(?i)^\s*\d+\.\s*([^.]+)", text, re.MULTILINE)
+        numbered_tasks = _NUMBERED_TASK_RE.findall(text)
         for task in numbered_tasks:
             task_text = task.strip()
             if len(task_text) > 5:
@@ -84,7 +93,7 @@ class ContextManager:
                 })
         
         # Look for bullet points
-        bullet_tasks = re.findall(r"(?i)^\s*[-*]\s*([^.]+)", text, re.MULTILINE)
+        bullet_tasks = _BULLET_TASK_RE.findall(text)
         for task in bullet_tasks:
             task_text = task.strip()
             if len(task_text) > 5 and not self._is_question(task_text):
@@ -102,7 +111,7 @@ class ContextManager:
         goals = []
         
         for pattern in self.goal_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = pattern.findall(text)
             for match in matches:
                 goal_text = match.strip()
                 if len(goal_text) > 10:  # Filter out very short matches
@@ -215,7 +224,7 @@ class ContextManager:
         # Simple approach: if no summary exists, use parts of the first user message
         if not context.summary and len(user_message) > 20:
             # Extract first sentence or first 150 characters
-            sentences = re.split(r'[.!?]+', user_message)
+            sentences = _SENTENCE_SPLIT_RE.split(user_message)
             if sentences and len(sentences[0]) > 10:
                 context.summary = sentences[0].strip()
             else:
@@ -236,6 +245,7 @@ class ContextManager:
         relevant_docs = []
         
         conversation_lower = conversation_text.lower()
+        conversation_words = set(_WORD_RE.findall(conversation_lower))
         
         for doc in available_documents:
             doc_id = doc.get("id", "")
@@ -249,8 +259,7 @@ class ContextManager:
                 continue
             
             # Check for keyword matches
-            conversation_words = set(re.findall(r'\w+', conversation_lower))
-            doc_words = set(re.findall(r'\w+', doc_title + " " + " ".join(doc_tags)))
+            doc_words = set(_WORD_RE.findall(doc_title + " " + " ".join(doc_tags)))
             
             # Calculate relevance score
             common_words = conversation_words.intersection(doc_words)
@@ -3,17 +3,56 @@ from typing import AsyncGenerator, Dict, Any, Optional, List
 import asyncio
 import json
 import logging
+import re
 from datetime import datetime
+from functools import lru_cache
 
 import httpx
 import openai
+import orjson
 from anthropic import Anthropic, AsyncAnthropic
 
 from ..config.llm_config import LLMProviderConfig, get_llm_config
 from ..schemas.chat import StreamingResponse
+from .stream_buffer import AdaptiveBatcher
+from .unified_llm_service import HTTP2_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
+# Model name prefixes mapped to provider names; the named group that matches
+# is the provider to route to
+_MODEL_PROVIDER_PATTERN = re.compile(
+    r"^(?:(?P<openai>gpt-|text-|davinci|curie|babbage|ada)|(?P<anthropic>claude-))"
+)
+
+@lru_cache(maxsize=128)
+def _provider_name_for_model(model: str) -> Optional[str]:
+    """Name of the provider that serves ``model``, or None if no prefix matches.
+    
+    Cached because chats reuse a handful of model names on every request.
+    """
+    match = _MODEL_PROVIDER_PATTERN.match(model)
+    return match.lastgroup if match else None
+
+def _convert_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Convert our message format to the OpenAI wire format"""
+    return [{"role": msg["role"], "content": msg["content"]} for msg in messages]
+
+@lru_cache(maxsize=64)
+def _payload_prefix(model: str, temperature: float, max_tokens: int, stream: bool) -> bytes:
+    """Pre-encoded JSON for the constant fields of a chat completion body.
+    
+    The result is an unterminated object ending in the "messages" key, so a
+    request body is ``prefix + orjson.dumps(messages) + b"}"``.
+    """
+    fields = orjson.dumps({
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": stream
+    })
+    return fields[:-1] + b',"messages":'
+
 class LLMProviderError(Exception):
     """Custom exception for LLM provider errors"""
     pass
@@ -21,9 +60,11 @@ class LLMProviderError(Exception):
 class BaseLLMProvider(ABC):
     """Base class for all LLM providers"""
     
-    def __init__(self, config: LLMProviderConfig):
+    def __init__(self, config: LLMProviderConfig, http_client: Optional[httpx.AsyncClient] = None):
         self.config = config
         self.client = None
+        # Connection pool shared across providers, owned by LLMClient
+        self.http_client = http_client
         
     @abstractmethod
     async def initialize(self) -> None:
@@ -78,11 +119,10 @@ class OpenAIProvider(BaseLLMProvider):
     ) -> AsyncGenerator[StreamingResponse, None]:
         """Generate OpenAI chat completion with streaming"""
         try:
+            batcher = AdaptiveBatcher.from_kwargs(kwargs)
+            
             # Convert our message format to OpenAI format
-            openai_messages = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in messages
-            ]
+            openai_messages = _convert_messages(messages)
             
             response = await self.client.chat.completions.create(
                 model=model,
@@ -95,27 +135,35 @@ class OpenAIProvider(BaseLLMProvider):
             
             if stream:
                 async for chunk in response:
-                    if chunk.choices and len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta
-                        if hasattr(delta, 'content') and delta.content:
-                            yield StreamingResponse(
-                                type="chunk",
-                                content=delta.content,
-                                metadata={"chunk_id": chunk.id}
-                            )
+                    if chunk.choices:
+                        choice = chunk.choices[0]
+                        content = getattr(choice.delta, "content", None)
+                        if content:
+                            batch = batcher.add(content)
+                            if batch:
+                                yield StreamingResponse.chunk(batch, metadata={"chunk_id": chunk.id})
                         
-                        # Check for completion
-                        if chunk.choices[0].finish_reason:
+                        # Content is emitted before completion so the last
+                        # token never trails the complete marker
+                        if choice.finish_reason:
+                            batch = batcher.flush()
+                            if batch:
+                                yield StreamingResponse.chunk(batch, metadata={"chunk_id": chunk.id})
                             yield StreamingResponse(
                                 type="complete",
                                 content="",
                                 metadata={
-                                    "finish_reason": chunk.choices[0].finish_reason,
+                                    "finish_reason": choice.finish_reason,
                                     "model": model,
                                     "usage": getattr(chunk, 'usage', None)
                                 }
                             )
                             break
+                
+                # Stream ended without a finish_reason; emit any buffered tail
+                batch = batcher.flush()
+                if batch:
+                    yield StreamingResponse.chunk(batch)
             else:
                 content = response.choices[0].message.content
                 yield StreamingResponse(
@@ -148,6 +196,9 @@ class OpenAIProvider(BaseLLMProvider):
             logger.error(f"Failed to fetch OpenAI models: {str(e)}")
             return ['gpt-4', 'gpt-4-turbo', 'gpt-3.5-turbo']  # Fallback
 
+# Options handled by the provider itself rather than passed to the SDK
+_ANTHROPIC_EXCLUDED_KWARGS = frozenset({"stream"})
+
 class AnthropicProvider(BaseLLMProvider):
     """Anthropic Claude provider"""
     
@@ -157,7 +208,8 @@ class AnthropicProvider(BaseLLMProvider):
             
         self.client = AsyncAnthropic(
             api_key=self.config.api_key,
-            base_url=self.config.base_url or "https://api.anthropic.com"
+            base_url=self.config.base_url or "https://api.anthropic.com",
+            http_client=self.http_client
         )
         
         logger.info("Anthropic provider initialized successfully")
@@ -175,19 +227,15 @@ class AnthropicProvider(BaseLLMProvider):
         try:
             # Convert messages for Anthropic format
             # Anthropic expects system message separate from user/assistant messages
-            system_message = ""
-            claude_messages = []
-            
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message = msg["content"]
-                else:
-                    claude_messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
+            system_message = next(
+                (msg["content"] for msg in reversed(messages) if msg["role"] == "system"), ""
+            )
+            claude_messages = _convert_messages(
+                [msg for msg in messages if msg["role"] != "system"]
+            )
             
-            kwargs_clean = {k: v for k, v in kwargs.items() if k not in ['stream']}
+            batcher = AdaptiveBatcher.from_kwargs(kwargs)
+            kwargs_clean = {k: v for k, v in kwargs.items() if k not in _ANTHROPIC_EXCLUDED_KWARGS}
             
             if stream:
                 async with self.client.messages.stream(
@@ -198,11 +246,18 @@ class AnthropicProvider(BaseLLMProvider):
                     messages=claude_messages,
                     **kwargs_clean
                 ) as stream_response:
-                    async for text in stream_response.text_stream:
-                        yield StreamingResponse(
-                            type="chunk",
-                            content=text
-                        )
+                    # Iterate raw events rather than text_stream to avoid the
+                    # SDK's per-token accumulator objects
+                    async for event in stream_response:
+                        if (event.type == "content_block_delta"
+                                and event.delta.type == "text_delta"):
+                            batch = batcher.add(event.delta.text)
+                            if batch:
+                                yield StreamingResponse.chunk(batch)
+                    
+                    batch = batcher.flush()
+                    if batch:
+                        yield StreamingResponse.chunk(batch)
                     
                     # Send completion signal
                     yield StreamingResponse(
@@ -264,14 +319,20 @@ class CustomEndpointProvider(BaseLLMProvider):
         if not self.config.base_url:
             raise LLMProviderError("Custom endpoint URL not provided")
         
+        # Only send an Authorization header when a key is configured
+        headers = {"Content-Type": "application/json"}
+        if self.config.api_key:
+            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        
         # Initialize httpx client for custom endpoints
         self.http_client = httpx.AsyncClient(
             base_url=self.config.base_url,
-            headers={
-                "Authorization": f"Bearer {self.config.api_key}" if self.config.api_key else {},
-                "Content-Type": "application/json"
-            },
-            timeout=30.0
+            headers=headers,
+            # HTTP/2 multiplexes concurrent SSE streams over one connection;
+            # it needs the optional h2 package, otherwise stay on HTTP/1.1
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=500),
+            timeout=httpx.Timeout(connect=5.0, read=300.0, write=30.0, pool=5.0)
         )
         
         logger.info(f"Custom endpoint provider initialized: {self.config.base_url}")
@@ -287,18 +348,23 @@ class CustomEndpointProvider(BaseLLMProvider):
     ) -> AsyncGenerator[StreamingResponse, None]:
         """Generate completion using custom OpenAI-compatible endpoint"""
         try:
-            payload = {
-                "model": model,
-                "messages": [{"role": msg["role"], "content": msg["content"]} for msg in messages],
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                "stream": stream,
-                **kwargs
-            }
+            batcher = AdaptiveBatcher.from_kwargs(kwargs)
+            if kwargs:
+                # Extra options vary per call, so they can't use the cached prefix
+                prefix = orjson.dumps({
+                    "model": model,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "stream": stream,
+                    **kwargs
+                })[:-1] + b',"messages":'
+            else:
+                prefix = _payload_prefix(model, temperature, max_tokens, stream)
+            body = prefix + orjson.dumps(_convert_messages(messages)) + b"}"
             
             if stream:
                 async with self.http_client.stream(
-                    "POST", "/v1/chat/completions", json=payload
+                    "POST", "/v1/chat/completions", content=body
                 ) as response:
                     response.raise_for_status()
                     
@@ -307,6 +373,9 @@ class CustomEndpointProvider(BaseLLMProvider):
                             data = line[6:]  # Remove "data: " prefix
                             
                             if data.strip() == "[DONE]":
+                                batch = batcher.flush()
+                                if batch:
+                                    yield StreamingResponse.chunk(batch)
                                 yield StreamingResponse(type="complete", content="")
                                 break
                             
@@ -316,14 +385,17 @@ class CustomEndpointProvider(BaseLLMProvider):
                                     delta = chunk["choices"][0].get("delta", {})
                                     content = delta.get("content", "")
                                     if content:
-                                        yield StreamingResponse(
-                                            type="chunk",
-                                            content=content
-                                        )
+                                        batch = batcher.add(content)
+                                        if batch:
+                                            yield StreamingResponse.chunk(batch)
                             except json.JSONDecodeError:
                                 continue
+                    
+                    batch = batcher.flush()
+                    if batch:
+                        yield StreamingResponse.chunk(batch)
             else:
-                response = await self.http_client.post("/v1/chat/completions", json=payload)
+                response = await self.http_client.post("/v1/chat/completions", content=body)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -359,6 +431,7 @@ class LLMClient:
     
     def __init__(self):
         self.providers: Dict[str, BaseLLMProvider] = {}
+        self.http_client: Optional[httpx.AsyncClient] = None
         self._initialized = False
         # Import settings here to avoid circular imports
         from ..core.config import settings
@@ -369,6 +442,14 @@ class LLMClient:
         if self._initialized:
             return
         
+        # Keepalive pool shared by SDK providers so concurrent chats reuse
+        # TLS connections instead of handshaking per request
+        if self.http_client is None:
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=500),
+                timeout=httpx.Timeout(connect=5.0, read=300.0, write=30.0, pool=5.0)
+            )
+        
         # Initialize OpenAI provider if API key is available
         if self.settings.OPENAI_API_KEY:
             try:
@@ -384,7 +465,7 @@ class LLMClient:
         if self.settings.ANTHROPIC_API_KEY:
             try:
                 config = get_llm_config("anthropic")
-                provider = AnthropicProvider(config)
+                provider = AnthropicProvider(config, http_client=self.http_client)
                 await provider.initialize()
                 self.providers["anthropic"] = provider
                 logger.info("Anthropic provider registered")
@@ -421,14 +502,13 @@ class LLMClient:
     
     def get_provider_for_model(self, model: str) -> Optional[BaseLLMProvider]:
         """Get the appropriate provider for a given model"""
-        if model.startswith(("gpt-", "text-", "davinci", "curie", "babbage", "ada")):
-            return self.providers.get("openai")
-        elif model.startswith(("claude-")):
-            return self.providers.get("anthropic")
-        else:
-            # Try custom provider first, then default, then any available
-            return (self.providers.get("custom") or 
-                   self.get_default_provider())
+        provider_name = _provider_name_for_model(model)
+        if provider_name:
+            return self.providers.get(provider_name)
+        
+        # Try custom provider first, then default, then any available
+        return (self.providers.get("custom") or 
+               self.get_default_provider())
     
     async def chat_completion(
         self,
@@ -477,6 +557,13 @@ class LLMClient:
                 models[name] = []
         
         return models
+    
+    async def close(self) -> None:
+        """Close the shared HTTP connection pool"""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+        self._initialized = False
 
 # Global client instance
 llm_client = LLMClient()
@@ -0,0 +1,111 @@
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Marks the end of the source stream in the bounded queue
+_END = object()
+
+
+class _SourceError:
+    """Carries an exception raised by the source across the bounded queue"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class AdaptiveBatcher:
+    """Coalesce streamed tokens into progressively larger batches.
+
+    The first batch is flushed after ``min_batch_size`` tokens so the first
+    token still reaches the client immediately; every flush then grows the
+    batch size by ``batch_size_growth_factor`` up to ``max_batch_size``.
+    Batches have no time-based flush, so batching is opt-in: the default
+    ``max_batch_size=1`` emits every token as-is. ChatService already merges
+    chunks on a deadline, so callers going through it should leave it off.
+    """
+
+    def __init__(
+        self,
+        min_batch_size: int = 1,
+        max_batch_size: int = 1,
+        batch_size_growth_factor: float = 3.0
+    ):
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size_growth_factor = batch_size_growth_factor
+        self.batch_size: float = self.min_batch_size
+        self._buffer: List[str] = []
+
+    @classmethod
+    def from_kwargs(cls, kwargs: Dict[str, Any]) -> "AdaptiveBatcher":
+        """Build a batcher from (and remove) batching options in provider kwargs"""
+        options = {
+            key: kwargs.pop(key)
+            for key in ("min_batch_size", "max_batch_size", "batch_size_growth_factor")
+            if key in kwargs
+        }
+        return cls(**options)
+
+    def add(self, token: str) -> Optional[str]:
+        """Buffer a token, returning the joined batch once it is full"""
+        self._buffer.append(token)
+        if len(self._buffer) >= self.batch_size:
+            batch = self.flush()
+            self.batch_size = min(
+                self.max_batch_size, self.batch_size * self.batch_size_growth_factor
+            )
+            return batch
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return whatever is buffered, or None if the buffer is empty"""
+        if not self._buffer:
+            return None
+        batch = "".join(self._buffer)
+        self._buffer.clear()
+        return batch
+
+
+async def bounded_generator(
+    source: AsyncIterator[T],
+    max_in_flight: int = 32
+) -> AsyncGenerator[T, None]:
+    """Re-yield ``source`` through a bounded queue to propagate back-pressure.
+
+    A producer task drains ``source`` into an ``asyncio.Queue`` of at most
+    ``max_in_flight`` items. When the consumer falls behind, ``queue.put``
+    blocks the producer, which stops reading from the upstream stream and
+    lets TCP flow control push back on the provider. Exceptions raised by
+    the source are re-raised to the consumer; closing the consumer early
+    cancels the producer.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+
+    async def produce() -> None:
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(_SourceError(e))
+            return
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, _SourceError):
+                raise item.error
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+        if hasattr(source, "aclose"):
+            await source.aclose()
@@ -1,16 +1,164 @@
 import yaml
 import os
+import time
+import hashlib
 import httpx
-import json
+import orjson
 import logging
-from typing import Dict, List, AsyncGenerator, Optional, Any
+import importlib.util
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, AsyncGenerator, AsyncIterator, Optional, Any, Callable, Tuple
 from dataclasses import dataclass
 from pathlib import Path
+from types import MappingProxyType
+from fastapi import Request
 
 from ..schemas.chat import StreamingResponse
 
+try:
+    import aiohttp
+except ImportError:
+    # aiohttp is an optional, lower-overhead transport for OpenAI streams
+    aiohttp = None
+
 logger = logging.getLogger(__name__)
 
+# HTTP/2 lets concurrent streams share one TLS connection; it needs the
+# optional h2 package (httpx[http2]), so fall back to HTTP/1.1 without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+@lru_cache(maxsize=16)
+def _load_config_cached(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Load the parsed YAML config for a given file version.
+    
+    Keyed on the file's mtime, so the YAML is only re-parsed after it
+    changes. The returned dict is shared and must not be mutated.
+    """
+    with open(path, 'r') as file:
+        return yaml.safe_load(file) or {}
+
+# Histories larger than this are serialized message by message while sending
+_STREAM_BODY_THRESHOLD = 1 << 20
+
+async def _iter_json_body(payload: Dict[str, Any]) -> AsyncGenerator[bytes, None]:
+    """Serialize a chat payload incrementally, one message per chunk"""
+    head = orjson.dumps({key: value for key, value in payload.items() if key != "messages"})
+    yield head[:-1] + (b',"messages":[' if len(head) > 2 else b'"messages":[')
+    for i, message in enumerate(payload["messages"]):
+        yield (b"," if i else b"") + orjson.dumps(message)
+    yield b"]}"
+
+def _request_body(payload: Dict[str, Any]):
+    """Return the request body, streaming it for very long chat histories"""
+    if sum(len(message["content"]) for message in payload["messages"]) < _STREAM_BODY_THRESHOLD:
+        return orjson.dumps(payload)
+    return _iter_json_body(payload)
+
+def _parse_openai_delta(chunk: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """Extract ``(content, finish_reason)`` from an OpenAI stream chunk.
+    
+    Indexes the fixed chunk shape directly and only falls back to the
+    defensive lookups when a chunk doesn't match it (e.g. usage-only chunks).
+    """
+    try:
+        choice = chunk["choices"][0]
+        return choice["delta"].get("content") or "", choice.get("finish_reason")
+    except (KeyError, IndexError, TypeError, AttributeError):
+        choices = chunk.get("choices") or [{}]
+        return "", choices[0].get("finish_reason")
+
+def _parse_anthropic_event(chunk: Dict[str, Any]) -> Tuple[str, bool]:
+    """Extract ``(text, is_message_stop)`` from an Anthropic stream event"""
+    event_type = chunk.get("type")
+    if event_type == "content_block_delta":
+        return (chunk.get("delta") or {}).get("text") or "", False
+    return "", event_type == "message_stop"
+
+_SSE_DATA_PREFIX = b"data: "
+_SSE_DONE = b"[DONE]"
+# Largest unterminated event we buffer before giving up on the stream
+MAX_EVENT_BYTES = 1 << 20
+
+class StreamingError(Exception):
+    """Raised when a provider stream cannot be parsed"""
+    pass
+
+def _iter_sse_events(response: httpx.Response) -> AsyncGenerator[Dict[str, Any], None]:
+    """Parse the server-sent event stream of an httpx response"""
+    return _parse_sse_chunks(response.aiter_bytes(65536))
+
+def _normalize_newlines(chunk: bytes, pending_cr: bool) -> Tuple[bytes, bool]:
+    """Rewrite CRLF and CR line endings as LF.
+    
+    A chunk ending in ``\r`` is converted straight away; ``pending_cr`` tells
+    the next call to drop a leading ``\n`` that completes that CRLF pair.
+    """
+    if not chunk:
+        return chunk, pending_cr
+    if pending_cr and chunk.startswith(b"\n"):
+        chunk = chunk[1:]
+    return chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n"), chunk.endswith(b"\r")
+
+def _sse_event_data(buf: bytearray, start: int, end: int) -> bytes:
+    """Join the ``data:`` lines of the event in ``buf[start:end]``"""
+    if buf.startswith(_SSE_DATA_PREFIX, start) and buf.find(b"\n", start, end) == -1:
+        # Common case: a single "data: <json>" line, sliced as-is
+        return buf[start + 6:end]
+    return b"\n".join(
+        line[6:] if line.startswith(_SSE_DATA_PREFIX) else line[5:]
+        for line in buf[start:end].split(b"\n")
+        if line.startswith(b"data:")
+    )
+
+async def _parse_sse_chunks(chunks: AsyncIterator[bytes]) -> AsyncGenerator[Dict[str, Any], None]:
+    """Parse raw server-sent event bytes into JSON payloads.
+    
+    Works on raw bytes instead of ``aiter_lines`` to skip per-line text
+    decoding, splits events on blank lines (LF, CRLF or CR line endings) and
+    feeds each ``data:`` payload straight to ``orjson``. A final event without
+    a trailing blank line is still parsed at EOF. Stops at the OpenAI
+    ``[DONE]`` sentinel; events that are not valid JSON are skipped. Raises
+    ``StreamingError`` if a single event grows past ``MAX_EVENT_BYTES``
+    without terminating.
+    """
+    buf = bytearray()
+    pending_cr = False
+    async for chunk in chunks:
+        if pending_cr or b"\r" in chunk:
+            chunk, pending_cr = _normalize_newlines(chunk, pending_cr)
+        buf += chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n\n", start)
+            if end == -1:
+                break
+            
+            data = _sse_event_data(buf, start, end)
+            start = end + 2
+            if not data:
+                continue
+            if data.startswith(_SSE_DONE):
+                return
+            
+            try:
+                yield orjson.loads(data)
+            except orjson.JSONDecodeError:
+                continue
+        
+        del buf[:start]
+        if len(buf) > MAX_EVENT_BYTES:
+            raise StreamingError(f"SSE event exceeded {MAX_EVENT_BYTES} bytes without terminating")
+    
+    # The stream may end without the blank line that terminates the last event
+    end = len(buf.rstrip(b"\n"))
+    data = _sse_event_data(buf, 0, end) if end else b""
+    if data and not data.startswith(_SSE_DONE):
+        try:
+            yield orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+
 @dataclass
 class ModelConfig:
     """Configuration for a specific LLM model"""
@@ -28,6 +176,9 @@ class ProviderConfig:
     api_key_env: str
     max_tokens_param: str = "max_tokens"
     intranet: bool = False
+    max_connections: int = 1000
+    max_keepalive_connections: int = 1000
+    keepalive_expiry: float = 30.0
 
 class UnifiedLLMService:
     """Unified service for all LLM providers and models"""
@@ -41,16 +192,24 @@ class UnifiedLLMService:
         self.models: Dict[str, ModelConfig] = {}
         self.default_model: str = ""
         self.default_timeout: int = 60
+        self.response_cache_ttl: float = 300
+        self.response_cache_size: int = 1024
         self.intranet_mode: bool = False
-        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self.http_transport: str = "httpx"
+        self._client: Optional[httpx.AsyncClient] = None
+        self._aiohttp_session = None
+        self._provider_headers: Dict[str, Tuple[str, MappingProxyType]] = {}
+        self._available_models_cache: Dict[tuple, List[Dict[str, str]]] = {}
+        self._dispatch: Dict[str, Tuple[ModelConfig, ProviderConfig, Optional[Callable]]] = {}
+        self._response_cache: "OrderedDict[bytes, Tuple[float, StreamingResponse]]" = OrderedDict()
         
         self._load_config()
     
     def _load_config(self):
         """Load configuration from YAML file"""
         try:
-            with open(self.config_path, 'r') as file:
-                config = yaml.safe_load(file)
+            path = str(self.config_path)
+            config = _load_config_cached(path, os.stat(path).st_mtime_ns)
             
             # Load providers
             for provider_id, provider_data in config.get('providers', {}).items():
@@ -64,6 +223,17 @@ class UnifiedLLMService:
             self.default_model = config.get('default_model', '')
             self.default_timeout = config.get('default_timeout', 60)
             
+            # Cache for deterministic non-streaming completions; ttl 0 disables it
+            self.response_cache_ttl = config.get('response_cache_ttl', 300)
+            self.response_cache_size = config.get('response_cache_size', 1024)
+            
+            # HTTP transport for OpenAI-style providers: "httpx" (default) or "aiohttp"
+            self.http_transport = config.get('http_transport', 'httpx')
+            if self.http_transport == "aiohttp" and aiohttp is None:
+                logger.warning("http_transport is 'aiohttp' but aiohttp is not installed; using httpx")
+                self.http_transport = "httpx"
+            self._response_cache.clear()
+            
             # Load intranet mode - can be overridden by environment variable
             config_intranet_mode = config.get('intranet_mode', False)
             env_intranet_mode_str = os.getenv('INTRANET_MODE', '').lower()
@@ -75,55 +245,146 @@ class UnifiedLLMService:
                 # Use config value if no environment variable is set
                 self.intranet_mode = config_intranet_mode
             
-            logger.info(f"Loaded {len(self.providers)} providers and {len(self.models)} models")
-            logger.info(f"Intranet mode: {self.intranet_mode}")
+            self._provider_headers.clear()
+            self._build_dispatch_table()
+            
+            # Precompute the model listing for the current environment
+            self._available_models_cache.clear()
+            self._get_available_models_cached()
+            
+            logger.info("Loaded %d providers and %d models", len(self.providers), len(self.models))
+            logger.info("Intranet mode: %s", self.intranet_mode)
             
         except Exception as e:
-            logger.error(f"Failed to load LLM configuration: {e}")
+            logger.error("Failed to load LLM configuration: %s", e)
             raise
     
-    def _get_http_client(self, provider_id: str) -> httpx.AsyncClient:
-        """Get or create HTTP client for a provider"""
-        if provider_id not in self._http_clients:
-            provider = self.providers[provider_id]
-            api_key = os.getenv(provider.api_key_env, "")
-            
-            headers = {
-                "Content-Type": "application/json"
-            }
-            
-            # Add appropriate authorization header based on provider type
-            # In intranet mode, intranet providers don't need API keys
-            if not (self.intranet_mode and provider.intranet):
-                if provider.type == "openai" and api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-                elif provider.type == "anthropic" and api_key:
-                    headers["x-api-key"] = api_key
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get or create the HTTP client shared by all providers"""
+        if self._client is None:
+            # One pool for every provider keeps TLS connections reused across
+            # mixed-provider traffic; size it for the largest provider
+            limits = httpx.Limits(
+                max_connections=max((p.max_connections for p in self.providers.values()), default=1000),
+                max_keepalive_connections=max(
+                    (p.max_keepalive_connections for p in self.providers.values()), default=1000
+                ),
+                keepalive_expiry=max((p.keepalive_expiry for p in self.providers.values()), default=30.0)
+            )
             
-            self._http_clients[provider_id] = httpx.AsyncClient(
-                base_url=provider.base_url,
-                headers=headers,
-                timeout=self.default_timeout
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=limits,
+                timeout=httpx.Timeout(
+                    connect=10.0,
+                    read=self.default_timeout,
+                    write=self.default_timeout,
+                    pool=self.default_timeout
+                )
             )
         
-        return self._http_clients[provider_id]
+        return self._client
     
-    async def get_available_models(self) -> List[Dict[str, str]]:
-        """Get list of available models with their common names"""
-        available_models = []
+    def _get_aiohttp_session(self):
+        """Get or create the aiohttp session used by the aiohttp transport"""
+        if self._aiohttp_session is None or self._aiohttp_session.closed:
+            max_connections = max((p.max_connections for p in self.providers.values()), default=1000)
+            keepalive_expiry = max((p.keepalive_expiry for p in self.providers.values()), default=30.0)
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max_connections, keepalive_timeout=keepalive_expiry),
+                timeout=aiohttp.ClientTimeout(
+                    connect=10.0,
+                    sock_read=self.default_timeout
+                )
+            )
+        
+        return self._aiohttp_session
+    
+    def _build_provider_headers(self, provider: ProviderConfig, api_key: str) -> MappingProxyType:
+        """Build immutable request headers for a provider"""
+        headers = {
+            "Content-Type": "application/json"
+        }
+        
+        # Add appropriate authorization header based on provider type
+        # In intranet mode, intranet providers don't need API keys
+        if not (self.intranet_mode and provider.intranet):
+            if provider.type == "openai" and api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            elif provider.type == "anthropic" and api_key:
+                headers["x-api-key"] = api_key
+        
+        return MappingProxyType(headers)
+    
+    def _get_provider_headers(self, provider_id: str) -> MappingProxyType:
+        """Return request headers for a provider.
+        
+        The API key is read from the environment on every call, like
+        ``_is_provider_available`` does, and the headers are rebuilt only when
+        it changed, so a key set after startup is sent with requests.
+        """
+        provider = self.providers[provider_id]
+        api_key = os.getenv(provider.api_key_env, "")
+        cached = self._provider_headers.get(provider_id)
+        if cached is None or cached[0] != api_key:
+            cached = (api_key, self._build_provider_headers(provider, api_key))
+            self._provider_headers[provider_id] = cached
+        return cached[1]
+    
+    def _build_dispatch_table(self):
+        """Resolve each model to its provider config and completion handler"""
+        handlers = {
+            "openai": (
+                self._aiohttp_openai_chat_completion
+                if self.http_transport == "aiohttp"
+                else self._openai_chat_completion
+            ),
+            "anthropic": self._anthropic_chat_completion
+        }
+        self._dispatch = {
+            model_id: (model_config, provider_config, handlers.get(provider_config.type))
+            for model_id, model_config in self.models.items()
+            if (provider_config := self.providers.get(model_config.provider)) is not None
+        }
+    
+    def reload(self):
+        """Reload configuration from the YAML file and drop derived caches"""
+        self.providers.clear()
+        self.models.clear()
+        self._load_config()
+    
+    def _get_available_models_cached(self) -> List[Dict[str, str]]:
+        """Return the model listing for the current provider availability.
+        
+        Listings are cached per availability signature, so API keys added or
+        removed at runtime are still reflected without rescanning every model.
+        """
+        availability = {
+            provider_id: self._is_provider_available(provider)
+            for provider_id, provider in self.providers.items()
+        }
+        key = tuple(availability.values())
         
-        for model_id, model_config in self.models.items():
-            provider = self.providers.get(model_config.provider)
-            if provider and self._is_provider_available(provider):
-                available_models.append({
+        available_models = self._available_models_cache.get(key)
+        if available_models is None:
+            available_models = [
+                {
                     "id": model_id,
                     "technical_name": model_config.technical_name,
                     "common_name": model_config.common_name,
                     "provider": model_config.provider
-                })
+                }
+                for model_id, model_config in self.models.items()
+                if availability.get(model_config.provider)
+            ]
+            self._available_models_cache[key] = available_models
         
         return available_models
     
+    async def get_available_models(self) -> List[Dict[str, str]]:
+        """Get list of available models with their common names"""
+        return self._get_available_models_cached()
+    
     def _is_provider_available(self, provider: ProviderConfig) -> bool:
         """Check if a provider is available (has required API key or is intranet)"""
         # In intranet mode, intranet providers are always available
@@ -148,7 +409,8 @@ class UnifiedLLMService:
     ) -> AsyncGenerator[StreamingResponse, None]:
         """Generate chat completion for any model"""
         
-        if model_id not in self.models:
+        entry = self._dispatch.get(model_id)
+        if entry is None:
             yield StreamingResponse(
                 type="error",
                 content="",
@@ -156,8 +418,7 @@ class UnifiedLLMService:
             )
             return
         
-        model_config = self.models[model_id]
-        provider_config = self.providers[model_config.provider]
+        model_config, provider_config, handler = entry
         
         # Use model defaults if not provided
         if temperature is None:
@@ -165,26 +426,50 @@ class UnifiedLLMService:
         if max_tokens is None:
             max_tokens = model_config.default_max_tokens
         
+        if handler is None:
+            yield StreamingResponse(
+                type="error",
+                content="",
+                error=f"Unsupported provider type: {provider_config.type}"
+            )
+            return
+        
+        # temperature=0 non-streaming completions are a pure function of
+        # their inputs, so serve repeats from a TTL cache
+        cache_key = None
+        if not stream and temperature == 0 and self.response_cache_ttl > 0:
+            try:
+                cache_key = hashlib.blake2b(
+                    orjson.dumps((model_id, messages, max_tokens, kwargs), option=orjson.OPT_SORT_KEYS),
+                    digest_size=16
+                ).digest()
+            except orjson.JSONEncodeError:
+                # Provider-specific kwargs that don't serialise just aren't cached
+                cache_key = None
+            cached = self._response_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                expires_at, cached_response = cached
+                if expires_at > time.monotonic():
+                    self._response_cache.move_to_end(cache_key)
+                    yield cached_response.model_copy(deep=True)
+                    return
+                del self._response_cache[cache_key]
+        
         try:
-            if provider_config.type == "openai":
-                async for response in self._openai_chat_completion(
-                    model_config, provider_config, messages, temperature, max_tokens, stream, **kwargs
-                ):
-                    yield response
-            elif provider_config.type == "anthropic":
-                async for response in self._anthropic_chat_completion(
-                    model_config, provider_config, messages, temperature, max_tokens, stream, **kwargs
-                ):
-                    yield response
-            else:
-                yield StreamingResponse(
-                    type="error",
-                    content="",
-                    error=f"Unsupported provider type: {provider_config.type}"
-                )
+            async for response in handler(
+                model_config, provider_config, messages, temperature, max_tokens, stream, **kwargs
+            ):
+                if cache_key is not None and response.type == "complete":
+                    self._response_cache[cache_key] = (
+                        time.monotonic() + self.response_cache_ttl,
+                        response.model_copy(deep=True)
+                    )
+                    if len(self._response_cache) > self.response_cache_size:
+                        self._response_cache.popitem(last=False)
+                yield response
                 
         except Exception as e:
-            logger.error(f"Error in chat completion for {model_id}: {e}")
+            logger.error("Error in chat completion for %s: %s", model_id, e)
             yield StreamingResponse(
                 type="error",
                 content="",
@@ -203,59 +488,29 @@ class UnifiedLLMService:
     ) -> AsyncGenerator[StreamingResponse, None]:
         """Handle OpenAI-style chat completion"""
         
-        client = self._get_http_client(model_config.provider)
+        client = self._get_http_client()
+        url = provider_config.base_url.rstrip("/") + "/v1/chat/completions"
+        headers = self._get_provider_headers(model_config.provider)
         
-        # Prepare the payload
-        payload = {
-            "model": model_config.technical_name,
-            "messages": messages,
-            "temperature": temperature,
-            provider_config.max_tokens_param: max_tokens,
-            "stream": stream,
-            **kwargs
-        }
+        payload = self._openai_payload(
+            model_config, provider_config, messages, temperature, max_tokens, stream, kwargs
+        )
         
         try:
             if stream:
-                async with client.stream("POST", "/v1/chat/completions", json=payload) as response:
+                async with client.stream("POST", url, content=_request_body(payload), headers=headers) as response:
                     response.raise_for_status()
                     
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]  # Remove "data: " prefix
-                            
-                            if data.strip() == "[DONE]":
-                                yield StreamingResponse(type="complete", content="")
-                                break
-                            
-                            try:
-                                chunk = json.loads(data)
-                                if "choices" in chunk and len(chunk["choices"]) > 0:
-                                    delta = chunk["choices"][0].get("delta", {})
-                                    content = delta.get("content", "")
-                                    if content:
-                                        yield StreamingResponse(
-                                            type="chunk",
-                                            content=content,
-                                            metadata={"model": model_config.technical_name}
-                                        )
-                                    
-                                    # Check for completion
-                                    finish_reason = chunk["choices"][0].get("finish_reason")
-                                    if finish_reason:
-                                        yield StreamingResponse(
-                                            type="complete",
-                                            content="",
-                                            metadata={
-                                                "finish_reason": finish_reason,
-                                                "model": model_config.technical_name
-                                            }
-                                        )
-                                        break
-                            except json.JSONDecodeError:
-                                continue
+                    events = _iter_sse_events(response)
+                    try:
+                        async for chunk in self._openai_stream_responses(events, model_config):
+                            yield chunk
+                    finally:
+                        # Release the connection to the pool now rather than on GC
+                        await events.aclose()
+                        await response.aclose()
             else:
-                response = await client.post("/v1/chat/completions", json=payload)
+                response = await client.post(url, content=_request_body(payload), headers=headers)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -288,6 +543,116 @@ class UnifiedLLMService:
                 error=str(e)
             )
     
+    def _openai_payload(
+        self,
+        model_config: ModelConfig,
+        provider_config: ProviderConfig,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the request payload for an OpenAI-style provider"""
+        return {
+            "model": model_config.technical_name,
+            "messages": messages,
+            "temperature": temperature,
+            provider_config.max_tokens_param: max_tokens,
+            "stream": stream,
+            **kwargs
+        }
+    
+    async def _openai_stream_responses(
+        self,
+        events: AsyncIterator[Dict[str, Any]],
+        model_config: ModelConfig
+    ) -> AsyncGenerator[StreamingResponse, None]:
+        """Convert OpenAI-style stream events into StreamingResponses"""
+        async for chunk in events:
+            content, finish_reason = _parse_openai_delta(chunk)
+            if content:
+                yield StreamingResponse(
+                    type="chunk",
+                    content=content,
+                    metadata={"model": model_config.technical_name}
+                )
+            
+            # Check for completion
+            if finish_reason:
+                yield StreamingResponse(
+                    type="complete",
+                    content="",
+                    metadata={
+                        "finish_reason": finish_reason,
+                        "model": model_config.technical_name
+                    }
+                )
+                return
+        
+        # Stream ended ([DONE]) without a finish_reason chunk
+        yield StreamingResponse(type="complete", content="")
+    
+    async def _aiohttp_openai_chat_completion(
+        self,
+        model_config: ModelConfig,
+        provider_config: ProviderConfig,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        stream: bool,
+        **kwargs
+    ) -> AsyncGenerator[StreamingResponse, None]:
+        """Handle OpenAI-style chat completion over the aiohttp transport"""
+        
+        session = self._get_aiohttp_session()
+        url = provider_config.base_url.rstrip("/") + "/v1/chat/completions"
+        headers = self._get_provider_headers(model_config.provider)
+        payload = self._openai_payload(
+            model_config, provider_config, messages, temperature, max_tokens, stream, kwargs
+        )
+        
+        try:
+            async with session.post(url, data=orjson.dumps(payload), headers=headers) as response:
+                if response.status >= 400:
+                    body = await response.read()
+                    try:
+                        error_detail = orjson.loads(body).get("error", {}).get("message", response.reason)
+                    except Exception:
+                        error_detail = body.decode("utf-8", "replace") or response.reason
+                    
+                    yield StreamingResponse(
+                        type="error",
+                        content="",
+                        error=f"HTTP {response.status}: {error_detail}"
+                    )
+                    return
+                
+                if stream:
+                    events = _parse_sse_chunks(response.content.iter_chunked(65536))
+                    try:
+                        async for chunk in self._openai_stream_responses(events, model_config):
+                            yield chunk
+                    finally:
+                        await events.aclose()
+                else:
+                    data = orjson.loads(await response.read())
+                    yield StreamingResponse(
+                        type="complete",
+                        content=data["choices"][0]["message"]["content"],
+                        metadata={
+                            "model": model_config.technical_name,
+                            "usage": data.get("usage", {})
+                        }
+                    )
+                    
+        except Exception as e:
+            yield StreamingResponse(
+                type="error",
+                content="",
+                error=str(e)
+            )
+    
     async def _anthropic_chat_completion(
         self,
         model_config: ModelConfig,
@@ -300,57 +665,53 @@ class UnifiedLLMService:
     ) -> AsyncGenerator[StreamingResponse, None]:
         """Handle Anthropic-style chat completion"""
         
-        client = self._get_http_client(model_config.provider)
-        
-        # Convert messages for Anthropic format (separate system message)
-        system_message = ""
-        anthropic_messages = []
+        client = self._get_http_client()
+        url = provider_config.base_url.rstrip("/") + "/v1/messages"
+        headers = self._get_provider_headers(model_config.provider)
         
-        for msg in messages:
-            if msg["role"] == "system":
-                system_message = msg["content"]
-            else:
-                anthropic_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        # Convert messages for Anthropic format (separate system message;
+        # the last one wins, as before)
+        system_message = next(
+            (msg["content"] for msg in reversed(messages) if msg["role"] == "system"), ""
+        )
         
         payload = {
             "model": model_config.technical_name,
             "max_tokens": max_tokens,
             "temperature": temperature,
-            "messages": anthropic_messages,
-            **kwargs
+            "messages": [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in messages
+                if msg["role"] != "system"
+            ],
+            **kwargs,
+            **({"system": system_message} if system_message else {}),
+            **({"stream": True} if stream else {})
         }
         
-        if system_message:
-            payload["system"] = system_message
-        
         try:
             if stream:
-                payload["stream"] = True
-                async with client.stream("POST", "/v1/messages", json=payload) as response:
+                async with client.stream("POST", url, content=_request_body(payload), headers=headers) as response:
                     response.raise_for_status()
                     
-                    async for line in response.aiter_lines():
-                        if line.startswith("data: "):
-                            data = line[6:]
-                            try:
-                                chunk = json.loads(data)
-                                if chunk.get("type") == "content_block_delta":
-                                    content = chunk.get("delta", {}).get("text", "")
-                                    if content:
-                                        yield StreamingResponse(
-                                            type="chunk",
-                                            content=content
-                                        )
-                                elif chunk.get("type") == "message_stop":
-                                    yield StreamingResponse(type="complete", content="")
-                                    break
-                            except json.JSONDecodeError:
-                                continue
+                    events = _iter_sse_events(response)
+                    try:
+                        async for chunk in events:
+                            content, done = _parse_anthropic_event(chunk)
+                            if content:
+                                yield StreamingResponse(
+                                    type="chunk",
+                                    content=content
+                                )
+                            elif done:
+                                yield StreamingResponse(type="complete", content="")
+                                break
+                    finally:
+                        # Release the connection to the pool now rather than on GC
+                        await events.aclose()
+                        await response.aclose()
             else:
-                response = await client.post("/v1/messages", json=payload)
+                response = await client.post(url, content=_request_body(payload), headers=headers)
                 response.raise_for_status()
                 
                 data = response.json()
@@ -372,13 +733,20 @@ class UnifiedLLMService:
             )
     
     async def close(self):
-        """Close all HTTP clients"""
-        for client in self._http_clients.values():
-            await client.aclose()
-
-# Global instance
-llm_service = UnifiedLLMService()
+        """Close the shared HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
 
-async def get_llm_service() -> UnifiedLLMService:
-    """Get the global LLM service instance"""
+def get_llm_service(request: Request) -> UnifiedLLMService:
+    """FastAPI dependency returning the LLM service created in the app lifespan"""
+    llm_service = getattr(request.app.state, "llm_service", None)
+    if llm_service is None:
+        raise RuntimeError(
+            "LLM service is not initialised; run the app with its lifespan "
+            "or override the get_llm_service dependency"
+        )
     return llm_service
\ No newline at end of file
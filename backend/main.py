@@ -7,6 +7,8 @@ import os
 
 from app.core.config import settings
 from app.core.database import create_db_and_tables
+from app.services.unified_llm_service import UnifiedLLMService
+from app.services.llm_client import llm_client
 from app.api import auth, documents, annotations, admin, chat
 from app.core.websocket import sio_app
 
@@ -14,9 +16,12 @@ from app.core.websocket import sio_app
 async def lifespan(app: FastAPI):
     # Startup
     await create_db_and_tables()
+    # Build the LLM service on the serving loop so its HTTP pool is bound to it
+    app.state.llm_service = UnifiedLLMService()
     yield
     # Shutdown
-    pass
+    await app.state.llm_service.close()
+    await llm_client.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -18,40 +18,39 @@ async def migrate_admin_fields():
         async with engine.begin() as conn:
             print("Checking current database schema...")
             
-            # Check if columns already exist
+            # Check which columns already exist in a single round-trip
             result = await conn.execute(text("""
                 SELECT column_name 
                 FROM information_schema.columns 
-                WHERE table_name = 'users' AND column_name = 'hashed_password'
+                WHERE table_name = 'users' AND column_name IN ('hashed_password', 'is_admin')
             """))
+            existing_columns = set(result.scalars().all())
             
-            if result.fetchone():
+            if "hashed_password" in existing_columns:
                 print("✅ Admin fields already exist in database")
                 return
             
             print("🔄 Adding admin fields to users table...")
             
-            # 1. Make OAuth fields nullable (for password-based users)
-            await conn.execute(text("ALTER TABLE users ALTER COLUMN oauth_provider DROP NOT NULL"))
-            await conn.execute(text("ALTER TABLE users ALTER COLUMN oauth_id DROP NOT NULL"))
-            print("  ✓ OAuth fields made nullable")
+            # Apply every change in one ALTER TABLE so Postgres takes the
+            # table lock and rewrites the catalog once instead of per column
+            clauses = [
+                # Make OAuth fields nullable (for password-based users)
+                "ALTER COLUMN oauth_provider DROP NOT NULL",
+                "ALTER COLUMN oauth_id DROP NOT NULL",
+                # Add password authentication fields
+                "ADD COLUMN hashed_password VARCHAR",
+                "ADD COLUMN password_reset_required BOOLEAN DEFAULT FALSE",
+                "ADD COLUMN password_reset_token VARCHAR",
+                "ADD COLUMN password_reset_expires TIMESTAMP",
+            ]
+            if "is_admin" not in existing_columns:
+                clauses.append("ADD COLUMN is_admin BOOLEAN DEFAULT FALSE")
             
-            # 2. Add password authentication fields
-            await conn.execute(text("ALTER TABLE users ADD COLUMN hashed_password VARCHAR"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN password_reset_required BOOLEAN DEFAULT FALSE"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN password_reset_token VARCHAR"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN password_reset_expires TIMESTAMP"))
+            await conn.execute(text(f"ALTER TABLE users {', '.join(clauses)}"))
+            print("  ✓ OAuth fields made nullable")
             print("  ✓ Password authentication fields added")
-            
-            # 3. Check if is_admin column exists, add if missing
-            admin_check = await conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'users' AND column_name = 'is_admin'
-            """))
-            
-            if not admin_check.fetchone():
-                await conn.execute(text("ALTER TABLE users ADD COLUMN is_admin BOOLEAN DEFAULT FALSE"))
+            if "is_admin" not in existing_columns:
                 print("  ✓ Admin role field added")
             else:
                 print("  ✓ Admin role field already exists")
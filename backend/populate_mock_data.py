@@ -10,13 +10,21 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+import aiofiles
+
 # Add the current directory to Python path to import app modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import get_async_session
 from app.models.user import User
 from app.models.document import Document, DocumentType
-from sqlalchemy import select
+from sqlalchemy import insert, select
+
+
+async def read_file(file_path: Path) -> str:
+    """Read a mock document without blocking the event loop."""
+    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+        return await f.read()
 
 
 async def populate_documents():
@@ -87,36 +95,43 @@ async def populate_documents():
                 print(f"Found {len(existing_documents)} existing documents. Skipping creation.")
                 return
             
-            # Create documents
-            created_count = 0
+            # Skip documents whose files are missing
+            available_documents = []
             for doc_data in mock_documents:
-                # Check if file exists
                 file_path = Path(__file__).parent / doc_data["file_path"]
                 if not file_path.exists():
                     print(f"Warning: File not found: {file_path}")
                     continue
-                
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Create document
-                document = Document(
-                    title=doc_data["title"],
-                    filename=doc_data["filename"],
-                    description=doc_data["description"],
-                    content=content,
-                    file_path=doc_data["file_path"],
-                    file_size=doc_data["file_size"],
-                    document_type=doc_data["document_type"],
-                    owner_id=user.id,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                
-                session.add(document)
-                created_count += 1
-                print(f"✅ Created: {doc_data['title']}")
+                available_documents.append((doc_data, file_path))
+            
+            # Read all file contents concurrently
+            contents = await asyncio.gather(
+                *(read_file(file_path) for _, file_path in available_documents)
+            )
+            
+            # Insert all documents in one executemany round-trip
+            now = datetime.utcnow()
+            rows = [
+                {
+                    "title": doc_data["title"],
+                    "filename": doc_data["filename"],
+                    "description": doc_data["description"],
+                    "content": content,
+                    "file_path": doc_data["file_path"],
+                    "file_size": doc_data["file_size"],
+                    "document_type": doc_data["document_type"],
+                    "owner_id": user.id,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for (doc_data, _), content in zip(available_documents, contents)
+            ]
+            
+            if rows:
+                await session.execute(insert(Document), rows)
+            created_count = len(rows)
+            for row in rows:
+                print(f"✅ Created: {row['title']}")
             
             # Commit all documents
             await session.commit()
@@ -2,12 +2,24 @@
 Pytest configuration and shared fixtures for chat system tests
 """
 import pytest
+import pytest_asyncio
 import asyncio
 import os
 import sys
+from types import MappingProxyType, SimpleNamespace
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import StaticPool
+
+try:
+    import uvloop
+    # Run the suite on the same libuv-backed loop uvicorn picks in production
+    # (loop="auto")
+    _BaseEventLoopPolicy = uvloop.EventLoopPolicy
+except ImportError:
+    # uvloop is not available on Windows; fall back to the default asyncio loop
+    _BaseEventLoopPolicy = asyncio.DefaultEventLoopPolicy
 
 # Add the project root to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,178 +28,282 @@ from app.core.database_config import Base
 from app.models.user import User
 from app.models.chat import ChatSession, ChatMessage, ChatContext
 
+# Seed statements are built once so every test reuses the same statement
+# objects (and their cached compiled forms) instead of rebuilding them
+_INSERT_USER = insert(User).returning(User)
+_INSERT_CHAT_SESSION = insert(ChatSession).returning(ChatSession)
+_INSERT_CHAT_MESSAGES = insert(ChatMessage).returning(ChatMessage, sort_by_parameter_order=True)
+_INSERT_CHAT_CONTEXT = insert(ChatContext).returning(ChatContext)
+
+_TEST_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class _TestEventLoopPolicy(_BaseEventLoopPolicy):
+    """Creates the loops pytest-asyncio runs each test in."""
+    
+    def new_event_loop(self):
+        loop = super().new_event_loop()
+        # Debug mode (PYTHONASYNCIODEBUG, python -X dev) slows every await down;
+        # keep it off regardless of how the runner was invoked
+        loop.set_debug(False)
+        return loop
+
 
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
+def event_loop_policy():
+    """Event loop policy pytest-asyncio builds every test's loop from."""
+    return _TestEventLoopPolicy()
 
 
-@pytest.fixture
-async def test_engine():
-    """Create a test database engine using SQLite in memory."""
+def _run_once(event_loop_policy, coro):
+    """Run ``coro`` to completion on a loop of its own.
+    
+    Session-scoped fixtures only use this for setup and teardown; the
+    engine they build holds no loop-bound state, so tests then use it from
+    their own per-test loops.
+    """
+    loop = event_loop_policy.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def _create_schema(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+@pytest.fixture(scope="session")
+def test_engine(event_loop_policy):
+    """Create a test database engine using SQLite in memory.
+    
+    The schema is created once per test session (once per worker under
+    ``pytest -n auto``); tests are isolated by rolling back a per-test
+    transaction in ``async_session``.
+    """
+    # A single shared connection keeps the one in-memory database alive for
+    # the whole session and skips reconnecting on every checkout. Each
+    # xdist worker is its own process, so each gets its own database.
     engine = create_async_engine(
         "sqlite+aiosqlite:///:memory:",
         echo=False,
-        future=True
+        echo_pool=False,
+        future=True,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
     )
     
+    # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs nest correctly
+    # (the sqlite3 driver otherwise manages transactions on its own).
+    # The test database is throwaway, so skip syncing, keep the journal and
+    # temp tables in memory and hold the lock for the single connection.
+    @event.listens_for(engine.sync_engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in _TEST_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+    
+    @event.listens_for(engine.sync_engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+    
     # Create all tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    _run_once(event_loop_policy, _create_schema(engine))
     
     yield engine
     
-    await engine.dispose()
+    _run_once(event_loop_policy, engine.dispose())
 
 
-@pytest.fixture
-async def async_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
-    """Create an async database session for testing."""
-    async_session_factory = sessionmaker(
-        test_engine, class_=AsyncSession, expire_on_commit=False
+@pytest.fixture(scope="session")
+def session_factory() -> async_sessionmaker:
+    """Session factory shared by every test; each test binds it to its own connection."""
+    return async_sessionmaker(
+        class_=AsyncSession,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint"
     )
-    
-    async with async_session_factory() as session:
-        yield session
 
 
-@pytest.fixture
-async def test_user(async_session) -> User:
-    """Create a test user for chat testing."""
-    user = User(
-        email="test@example.com",
-        name="Test User",
-        hashed_password="fake_hashed_password",
-        is_active=True,
-        is_admin=False
-    )
-    
-    async_session.add(user)
-    await async_session.commit()
-    await async_session.refresh(user)
+@pytest_asyncio.fixture
+async def async_session(test_engine, session_factory) -> AsyncGenerator[AsyncSession, None]:
+    """Create an async database session for testing.
     
-    return user
+    The session is bound to a connection inside an outer transaction and
+    turns its own commits into SAVEPOINTs, so everything a test writes is
+    rolled back at teardown without rebuilding the schema.
+    """
+    async with test_engine.connect() as conn:
+        transaction = await conn.begin()
+        session = session_factory(bind=conn)
+        
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
 
 
-@pytest.fixture
-async def test_chat_session(async_session, test_user) -> ChatSession:
-    """Create a test chat session."""
-    session = ChatSession(
-        user_id=test_user.id,
-        title="Test Chat Session",
-        status="active",
-        session_metadata={"test": "data"},
-        settings={"model": "test_model", "temperature": 0.7}
-    )
-    
-    async_session.add(session)
-    await async_session.commit()
-    await async_session.refresh(session)
-    
-    return session
+async def _insert_test_user(engine):
+    async with engine.begin() as conn:
+        return (await conn.execute(
+            insert(User).returning(User.id, User.email),
+            {
+                "email": "shared-user@example.com",
+                "name": "Test User",
+                "hashed_password": "fake_hash",
+                "is_active": True,
+                "is_admin": False
+            }
+        )).one()
 
 
-@pytest.fixture
-async def test_chat_messages(async_session, test_chat_session) -> list[ChatMessage]:
-    """Create test chat messages."""
-    messages = [
-        ChatMessage(
-            session_id=test_chat_session.id,
-            role="user",
-            content="Hello, can you help me with my project?",
-            message_metadata={"source": "test"}
-        ),
-        ChatMessage(
-            session_id=test_chat_session.id,
-            role="assistant",
-            content="Of course! I'd be happy to help you with your project. What specific area would you like assistance with?",
-            model="test_model",
-            tokens=25,
-            message_metadata={"completion_reason": "stop"}
-        ),
-        ChatMessage(
-            session_id=test_chat_session.id,
-            role="user",
-            content="I'm working on a Python web application and need help with authentication.",
-            message_metadata={"source": "test"}
-        )
-    ]
+@pytest.fixture(scope="session")
+def test_user(test_engine, event_loop_policy) -> SimpleNamespace:
+    """A user committed once for the whole test session.
     
-    async_session.add_all(messages)
-    await async_session.commit()
+    The row is written outside the per-test transactions, so it survives
+    every rollback; tests get a plain id/email snapshot rather than an ORM
+    instance. Its email differs from ``seed``'s user to keep both insertable.
+    """
+    row = _run_once(event_loop_policy, _insert_test_user(test_engine))
+    return SimpleNamespace(id=row.id, email=row.email)
+
+
+@pytest_asyncio.fixture
+async def seed(async_session) -> SimpleNamespace:
+    """Seed a user, chat session, messages and context for chat testing.
     
-    for message in messages:
-        await async_session.refresh(message)
+    All four tables are written inside a single transaction with one
+    INSERT ... RETURNING round-trip per table, instead of a commit (and
+    refresh) per object.
+    """
+    async with async_session.begin():
+        user = await async_session.scalar(
+            _INSERT_USER,
+            [{
+                "email": "test@example.com",
+                "name": "Test User",
+                "hashed_password": "fake_hashed_password",
+                "is_active": True,
+                "is_admin": False
+            }]
+        )
+        
+        chat_session = await async_session.scalar(
+            _INSERT_CHAT_SESSION,
+            [{
+                "user_id": user.id,
+                "title": "Test Chat Session",
+                "status": "active",
+                "session_metadata": {"test": "data"},
+                "settings": {"model": "test_model", "temperature": 0.7}
+            }]
+        )
+        
+        result = await async_session.scalars(
+            _INSERT_CHAT_MESSAGES,
+            [
+                {
+                    "session_id": chat_session.id,
+                    "role": "user",
+                    "content": "Hello, can you help me with my project?",
+                    "message_metadata": {"source": "test"}
+                },
+                {
+                    "session_id": chat_session.id,
+                    "role": "assistant",
+                    "content": "Of course! I'd be happy to help you with your project. What specific area would you like assistance with?",
+                    "model": "test_model",
+                    "tokens": 25,
+                    "message_metadata": {"completion_reason": "stop"}
+                },
+                {
+                    "session_id": chat_session.id,
+                    "role": "user",
+                    "content": "I'm working on a Python web application and need help with authentication.",
+                    "message_metadata": {"source": "test"}
+                }
+            ]
+        )
+        messages = result.all()
+        
+        context = await async_session.scalar(
+            _INSERT_CHAT_CONTEXT,
+            [{
+                "session_id": chat_session.id,
+                "summary": "User needs help with Python web application authentication",
+                "current_goal": "Implement secure user authentication system",
+                "tasks": [
+                    {
+                        "id": "task-1",
+                        "description": "Set up password hashing",
+                        "status": "pending",
+                        "priority": "high",
+                        "created_at": "2024-01-01T00:00:00Z"
+                    },
+                    {
+                        "id": "task-2",
+                        "description": "Implement login endpoints",
+                        "status": "pending",
+                        "priority": "high", 
+                        "created_at": "2024-01-01T00:00:00Z"
+                    },
+                    {
+                        "id": "task-3",
+                        "description": "Add session management",
+                        "status": "completed",
+                        "priority": "medium",
+                        "created_at": "2024-01-01T00:00:00Z",
+                        "completed_at": "2024-01-02T00:00:00Z"
+                    }
+                ],
+                "relevant_documents": ["auth_guide.md", "security_best_practices.md"]
+            }]
+        )
     
-    return messages
+    return SimpleNamespace(
+        user=user,
+        session=chat_session,
+        messages=messages,
+        context=context
+    )
 
 
-@pytest.fixture
-async def test_chat_context(async_session, test_chat_session) -> ChatContext:
-    """Create test chat context."""
-    context = ChatContext(
-        session_id=test_chat_session.id,
-        summary="User needs help with Python web application authentication",
-        current_goal="Implement secure user authentication system",
-        tasks=[
-            {
-                "id": "task-1",
-                "description": "Set up password hashing",
-                "status": "pending",
-                "priority": "high",
-                "created_at": "2024-01-01T00:00:00Z"
-            },
-            {
-                "id": "task-2",
-                "description": "Implement login endpoints",
-                "status": "pending",
-                "priority": "high", 
-                "created_at": "2024-01-01T00:00:00Z"
-            },
-            {
-                "id": "task-3",
-                "description": "Add session management",
-                "status": "completed",
-                "priority": "medium",
-                "created_at": "2024-01-01T00:00:00Z",
-                "completed_at": "2024-01-02T00:00:00Z"
-            }
-        ],
-        relevant_documents=["auth_guide.md", "security_best_practices.md"],
-        context_metadata={"complexity": "medium", "estimated_hours": 6}
+# Predefined LLM responses, built once at import and frozen so tests
+# cannot mutate the shared copy
+_MOCK_LLM_RESPONSES = MappingProxyType({
+    "simple_response": (
+        MappingProxyType({"type": "chunk", "content": "Hello"}),
+        MappingProxyType({"type": "chunk", "content": " there!"}),
+        MappingProxyType({"type": "complete", "content": "", "metadata": {"usage": {"total_tokens": 10}}})
+    ),
+    "code_help_response": (
+        MappingProxyType({"type": "chunk", "content": "I can help you"}),
+        MappingProxyType({"type": "chunk", "content": " with your authentication"}),
+        MappingProxyType({"type": "chunk", "content": " system. Here's what"}),
+        MappingProxyType({"type": "chunk", "content": " I recommend:"}),
+        MappingProxyType({"type": "complete", "content": "", "metadata": {"usage": {"total_tokens": 45}}})
+    ),
+    "error_response": (
+        MappingProxyType({"type": "chunk", "content": "I'm sorry"}),
+        MappingProxyType({"type": "error", "error": "Service temporarily unavailable"})
     )
-    
-    async_session.add(context)
-    await async_session.commit()
-    await async_session.refresh(context)
-    
-    return context
+})
 
 
 @pytest.fixture
 def mock_llm_responses():
     """Predefined LLM responses for testing."""
-    return {
-        "simple_response": [
-            {"type": "chunk", "content": "Hello"},
-            {"type": "chunk", "content": " there!"},
-            {"type": "complete", "content": "", "metadata": {"usage": {"total_tokens": 10}}}
-        ],
-        "code_help_response": [
-            {"type": "chunk", "content": "I can help you"},
-            {"type": "chunk", "content": " with your authentication"},
-            {"type": "chunk", "content": " system. Here's what"},
-            {"type": "chunk", "content": " I recommend:"},
-            {"type": "complete", "content": "", "metadata": {"usage": {"total_tokens": 45}}}
-        ],
-        "error_response": [
-            {"type": "chunk", "content": "I'm sorry"},
-            {"type": "error", "error": "Service temporarily unavailable"}
-        ]
-    }
+    return _MOCK_LLM_RESPONSES
 
 
 # Mark async tests
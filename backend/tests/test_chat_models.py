@@ -1,59 +1,31 @@
 import pytest
 import asyncio
 from datetime import datetime
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
 
-from app.core.database import Base
 from app.models.chat import ChatSession, ChatMessage, ChatContext
 from app.models.user import User
 
+# Lookups shared across tests are built once; each call only binds its ids
+_SELECT_MESSAGES_BY_SESSION = (
+    select(ChatMessage)
+    .where(ChatMessage.session_id == bindparam("session_id"))
+    .order_by(ChatMessage.timestamp)
+)
+_COUNT_MESSAGES_BY_SESSION = (
+    select(func.count()).select_from(ChatMessage).where(ChatMessage.session_id == bindparam("session_id"))
+)
+_COUNT_CONTEXTS_BY_SESSION = (
+    select(func.count()).select_from(ChatContext).where(ChatContext.session_id == bindparam("session_id"))
+)
+_COUNT_SESSIONS_BY_USER = (
+    select(func.count()).select_from(ChatSession).where(ChatSession.user_id == bindparam("user_id"))
+)
 
-@pytest.fixture
-async def async_engine():
-    """Create async SQLite engine for testing"""
-    engine = create_async_engine(
-        "sqlite+aiosqlite:///:memory:",
-        echo=False
-    )
-    
-    # Create all tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    yield engine
-    
-    await engine.dispose()
-
-
-@pytest.fixture
-async def async_session(async_engine):
-    """Create async session for testing"""
-    async_session_maker = sessionmaker(
-        async_engine, class_=AsyncSession, expire_on_commit=False
-    )
-    
-    async with async_session_maker() as session:
-        yield session
-
-
-@pytest.fixture
-async def test_user(async_session):
-    """Create test user for chat testing"""
-    user = User(
-        email="test@example.com",
-        name="Test User",
-        hashed_password="fake_hash",
-        is_active=True,
-        is_admin=False
-    )
-    
-    async_session.add(user)
-    await async_session.commit()
-    await async_session.refresh(user)
-    
-    return user
+# async_session and test_user come from conftest: one session-scoped in-memory
+# engine whose schema (and shared user) is created once, with each test rolled
+# back at teardown
 
 
 class TestChatSession:
@@ -71,8 +43,7 @@ class TestChatSession:
         )
         
         async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
+        await async_session.flush()
         
         assert session.id is not None
         assert session.user_id == test_user.id
@@ -85,87 +56,65 @@ class TestChatSession:
         assert session.created_at is not None
         assert session.updated_at is not None
     
-    @pytest.mark.asyncio
-    async def test_chat_session_defaults(self, async_session, test_user):
-        """Test default values for ChatSession"""
-        session = ChatSession(user_id=test_user.id)
-        
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        assert session.title == "New Chat"
-        assert session.status == "active"
-        assert session.session_metadata == {}
-        assert session.settings == {}
-        assert session.message_count == 0
-        assert session.total_tokens == 0
-    
     @pytest.mark.asyncio
     async def test_chat_session_user_relationship(self, async_session, test_user):
         """Test relationship between ChatSession and User"""
-        session = ChatSession(
-            user_id=test_user.id,
-            title="Test Session"
-        )
-        
-        async_session.add(session)
-        await async_session.commit()
+        async with async_session.begin():
+            session = ChatSession(
+                user_id=test_user.id,
+                title="Test Session"
+            )
+            
+            async_session.add(session)
         
-        # Test loading with relationship
+        # Test loading with relationship, eager-loaded in the same query
         result = await async_session.execute(
-            select(ChatSession).where(ChatSession.id == session.id)
+            select(ChatSession)
+            .options(joinedload(ChatSession.user))
+            .where(ChatSession.id == session.id)
         )
         loaded_session = result.scalar_one()
         
         # Test accessing user relationship
-        await async_session.refresh(loaded_session, ['user'])
         assert loaded_session.user.id == test_user.id
-        assert loaded_session.user.email == "test@example.com"
+        assert loaded_session.user.email == test_user.email
     
     @pytest.mark.asyncio
     async def test_chat_session_cascade_delete(self, async_session, test_user):
         """Test cascade delete for chat session and related messages"""
-        session = ChatSession(
-            user_id=test_user.id,
-            title="Test Session"
-        )
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Add messages to the session
-        message1 = ChatMessage(
-            session_id=session.id,
-            role="user",
-            content="Hello"
-        )
-        message2 = ChatMessage(
-            session_id=session.id,
-            role="assistant",
-            content="Hi there!"
-        )
-        
-        async_session.add_all([message1, message2])
-        await async_session.commit()
+        async with async_session.begin():
+            session = ChatSession(
+                user_id=test_user.id,
+                title="Test Session"
+            )
+            async_session.add(session)
+            await async_session.flush()
+            
+            # Add messages to the session; committed together with the session
+            message1 = ChatMessage(
+                session_id=session.id,
+                role="user",
+                content="Hello"
+            )
+            message2 = ChatMessage(
+                session_id=session.id,
+                role="assistant",
+                content="Hi there!"
+            )
+            
+            async_session.add_all([message1, message2])
         
         # Verify messages exist
-        result = await async_session.execute(
-            select(ChatMessage).where(ChatMessage.session_id == session.id)
-        )
-        messages = result.scalars().all()
-        assert len(messages) == 2
+        message_count = await async_session.scalar(_COUNT_MESSAGES_BY_SESSION, {"session_id": session.id})
+        assert message_count == 2
         
         # Delete the session
         await async_session.delete(session)
         await async_session.commit()
         
         # Verify messages were cascade deleted
-        result = await async_session.execute(
-            select(ChatMessage).where(ChatMessage.session_id == session.id)
-        )
-        messages = result.scalars().all()
-        assert len(messages) == 0
+        message_count = await async_session.scalar(_COUNT_MESSAGES_BY_SESSION, {"session_id": session.id})
+        assert message_count == 0
 
 
 class TestChatMessage:
@@ -177,8 +126,7 @@ class TestChatMessage:
         # Create session first
         session = ChatSession(user_id=test_user.id, title="Test Session")
         async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
+        await async_session.flush()
         
         # Create message
         message = ChatMessage(
@@ -193,8 +141,7 @@ class TestChatMessage:
         )
         
         async_session.add(message)
-        await async_session.commit()
-        await async_session.refresh(message)
+        await async_session.flush()
         
         assert message.id is not None
         assert message.session_id == session.id
@@ -207,87 +154,56 @@ class TestChatMessage:
         assert message.annotation_references == ["annotation1", "annotation2"]
         assert message.timestamp is not None
     
-    @pytest.mark.asyncio
-    async def test_chat_message_defaults(self, async_session, test_user):
-        """Test default values for ChatMessage"""
-        # Create session first
-        session = ChatSession(user_id=test_user.id)
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create minimal message
-        message = ChatMessage(
-            session_id=session.id,
-            role="user",
-            content="Test message"
-        )
-        
-        async_session.add(message)
-        await async_session.commit()
-        await async_session.refresh(message)
-        
-        assert message.tokens is None
-        assert message.model is None
-        assert message.message_metadata == {}
-        assert message.document_references == []
-        assert message.annotation_references == []
-    
     @pytest.mark.asyncio
     async def test_chat_message_session_relationship(self, async_session, test_user):
         """Test relationship between ChatMessage and ChatSession"""
-        # Create session
-        session = ChatSession(user_id=test_user.id, title="Test Session")
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create message
-        message = ChatMessage(
-            session_id=session.id,
-            role="user",
-            content="Test message"
-        )
-        async_session.add(message)
-        await async_session.commit()
+        async with async_session.begin():
+            # Create session
+            session = ChatSession(user_id=test_user.id, title="Test Session")
+            async_session.add(session)
+            await async_session.flush()
+            
+            # Create message
+            message = ChatMessage(
+                session_id=session.id,
+                role="user",
+                content="Test message"
+            )
+            async_session.add(message)
         
-        # Test loading with relationship
+        # Test loading with relationship, eager-loaded in the same query
         result = await async_session.execute(
-            select(ChatMessage).where(ChatMessage.id == message.id)
+            select(ChatMessage)
+            .options(joinedload(ChatMessage.session))
+            .where(ChatMessage.id == message.id)
         )
         loaded_message = result.scalar_one()
         
         # Test accessing session relationship
-        await async_session.refresh(loaded_message, ['session'])
         assert loaded_message.session.id == session.id
         assert loaded_message.session.title == "Test Session"
     
     @pytest.mark.asyncio
     async def test_multiple_messages_same_session(self, async_session, test_user):
         """Test multiple messages in the same session"""
-        # Create session
-        session = ChatSession(user_id=test_user.id, title="Conversation")
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create conversation
-        messages = [
-            ChatMessage(session_id=session.id, role="user", content="Hello"),
-            ChatMessage(session_id=session.id, role="assistant", content="Hi there!"),
-            ChatMessage(session_id=session.id, role="user", content="How are you?"),
-            ChatMessage(session_id=session.id, role="assistant", content="I'm doing well, thank you!")
-        ]
-        
-        async_session.add_all(messages)
-        await async_session.commit()
+        async with async_session.begin():
+            # Create session
+            session = ChatSession(user_id=test_user.id, title="Conversation")
+            async_session.add(session)
+            await async_session.flush()
+            
+            # Create conversation
+            messages = [
+                ChatMessage(session_id=session.id, role="user", content="Hello"),
+                ChatMessage(session_id=session.id, role="assistant", content="Hi there!"),
+                ChatMessage(session_id=session.id, role="user", content="How are you?"),
+                ChatMessage(session_id=session.id, role="assistant", content="I'm doing well, thank you!")
+            ]
+            
+            async_session.add_all(messages)
         
         # Verify all messages are saved
-        result = await async_session.execute(
-            select(ChatMessage)
-            .where(ChatMessage.session_id == session.id)
-            .order_by(ChatMessage.timestamp)
-        )
+        result = await async_session.execute(_SELECT_MESSAGES_BY_SESSION, {"session_id": session.id})
         saved_messages = result.scalars().all()
         
         assert len(saved_messages) == 4
@@ -310,8 +226,7 @@ class TestChatContext:
         # Create session first
         session = ChatSession(user_id=test_user.id, title="Test Session")
         async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
+        await async_session.flush()
         
         # Create context
         context = ChatContext(
@@ -337,8 +252,7 @@ class TestChatContext:
         )
         
         async_session.add(context)
-        await async_session.commit()
-        await async_session.refresh(context)
+        await async_session.flush()
         
         assert context.id is not None
         assert context.session_id == session.id
@@ -352,81 +266,59 @@ class TestChatContext:
         assert context.created_at is not None
         assert context.updated_at is not None
     
-    @pytest.mark.asyncio
-    async def test_chat_context_defaults(self, async_session, test_user):
-        """Test default values for ChatContext"""
-        # Create session first
-        session = ChatSession(user_id=test_user.id)
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create minimal context
-        context = ChatContext(session_id=session.id)
-        
-        async_session.add(context)
-        await async_session.commit()
-        await async_session.refresh(context)
-        
-        assert context.summary is None
-        assert context.current_goal is None
-        assert context.tasks == []
-        assert context.relevant_documents == []
-        assert context.context_metadata == {}
-    
     @pytest.mark.asyncio
     async def test_chat_context_session_relationship(self, async_session, test_user):
         """Test one-to-one relationship between ChatContext and ChatSession"""
-        # Create session
-        session = ChatSession(user_id=test_user.id, title="Test Session")
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create context
-        context = ChatContext(
-            session_id=session.id,
-            summary="Test problem"
-        )
-        async_session.add(context)
-        await async_session.commit()
+        async with async_session.begin():
+            # Create session
+            session = ChatSession(user_id=test_user.id, title="Test Session")
+            async_session.add(session)
+            await async_session.flush()
+            
+            # Create context
+            context = ChatContext(
+                session_id=session.id,
+                summary="Test problem"
+            )
+            async_session.add(context)
         
-        # Test loading with relationship
+        # Test loading with relationship, eager-loaded in the same query
         result = await async_session.execute(
-            select(ChatContext).where(ChatContext.session_id == session.id)
+            select(ChatContext)
+            .options(joinedload(ChatContext.session))
+            .where(ChatContext.session_id == session.id)
         )
         loaded_context = result.scalar_one()
         
         # Test accessing session relationship
-        await async_session.refresh(loaded_context, ['session'])
         assert loaded_context.session.id == session.id
         assert loaded_context.session.title == "Test Session"
         
         # Test reverse relationship
         result = await async_session.execute(
-            select(ChatSession).where(ChatSession.id == session.id)
+            select(ChatSession)
+            .options(joinedload(ChatSession.context))
+            .where(ChatSession.id == session.id)
         )
         loaded_session = result.scalar_one()
         
-        await async_session.refresh(loaded_session, ['context'])
         assert loaded_session.context.summary == "Test problem"
     
     @pytest.mark.asyncio
     async def test_chat_context_unique_constraint(self, async_session, test_user):
         """Test that only one context can exist per session"""
-        # Create session
-        session = ChatSession(user_id=test_user.id)
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Create first context
-        context1 = ChatContext(
-            session_id=session.id,
-            summary="First context"
-        )
-        async_session.add(context1)
-        await async_session.commit()
+        async with async_session.begin():
+            # Create session
+            session = ChatSession(user_id=test_user.id)
+            async_session.add(session)
+            await async_session.flush()
+            
+            # Create first context
+            context1 = ChatContext(
+                session_id=session.id,
+                summary="First context"
+            )
+            async_session.add(context1)
         
         # Try to create second context for same session
         context2 = ChatContext(
@@ -442,132 +334,162 @@ class TestChatContext:
     @pytest.mark.asyncio
     async def test_chat_context_json_fields_modification(self, async_session, test_user):
         """Test modifying JSON fields in ChatContext"""
-        # Create session and context
-        session = ChatSession(user_id=test_user.id)
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        context = ChatContext(
-            session_id=session.id,
-            tasks=[],
-            relevant_documents=[]
+        async with async_session.begin():
+            # Create session and context together in a single commit
+            session = ChatSession(user_id=test_user.id)
+            context = ChatContext(
+                session=session,
+                tasks=[],
+                relevant_documents=[]
+            )
+            async_session.add_all([session, context])
+        
+        # Modify the JSON fields with a single UPDATE round-trip
+        await async_session.execute(
+            update(ChatContext)
+            .where(ChatContext.id == context.id)
+            .values(
+                tasks=[{"id": "task-1", "description": "New task", "status": "pending"}],
+                relevant_documents=["new_doc.md"]
+            )
         )
-        async_session.add(context)
-        await async_session.commit()
-        await async_session.refresh(context)
         
-        # Modify tasks
-        context.tasks = [
-            {"id": "task-1", "description": "New task", "status": "pending"}
-        ]
-        context.relevant_documents = ["new_doc.md"]
-        
-        await async_session.commit()
-        
-        # Reload and verify changes
-        result = await async_session.execute(
-            select(ChatContext).where(ChatContext.id == context.id)
-        )
-        updated_context = result.scalar_one()
+        # Reload by primary key and verify changes; populate_existing re-reads
+        # the row instead of returning the identity-mapped instance as-is
+        updated_context = await async_session.get(ChatContext, context.id, populate_existing=True)
         
         assert len(updated_context.tasks) == 1
         assert updated_context.tasks[0]["description"] == "New task"
         assert updated_context.relevant_documents == ["new_doc.md"]
 
 
+class TestChatModelDefaults:
+    """Test default column values across the chat models"""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("model_cls, kwargs, expected", [
+        pytest.param(ChatSession, {}, {
+            "title": "New Chat",
+            "status": "active",
+            "session_metadata": {},
+            "settings": {},
+            "message_count": 0,
+            "total_tokens": 0
+        }, id="session"),
+        pytest.param(ChatMessage, {"role": "user", "content": "Test message"}, {
+            "tokens": None,
+            "model": None,
+            "message_metadata": {},
+            "document_references": [],
+            "annotation_references": []
+        }, id="message"),
+        pytest.param(ChatContext, {}, {
+            "summary": None,
+            "current_goal": None,
+            "tasks": [],
+            "relevant_documents": [],
+            "context_metadata": {}
+        }, id="context"),
+    ])
+    async def test_defaults(self, async_session, test_user, model_cls, kwargs, expected):
+        """Test default values for a minimally constructed chat model"""
+        # Messages and contexts hang off a session; both rows go in one flush
+        session = ChatSession(user_id=test_user.id)
+        instance = session if model_cls is ChatSession else model_cls(session=session, **kwargs)
+        
+        async_session.add_all([session, instance])
+        await async_session.flush()
+        
+        for attribute, value in expected.items():
+            assert getattr(instance, attribute) == value
+
+
 class TestChatModelsIntegration:
     """Integration tests for all chat models working together"""
     
     @pytest.mark.asyncio
     async def test_full_chat_workflow(self, async_session, test_user):
         """Test complete workflow: session -> messages -> context"""
-        # Create chat session
-        session = ChatSession(
-            user_id=test_user.id,
-            title="Problem Solving Session",
-            settings={"model": "test_model", "temperature": 0.7}
-        )
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        # Add messages to the conversation
-        messages = [
-            ChatMessage(
-                session_id=session.id,
-                role="user",
-                content="I need help fixing a bug in my authentication system"
-            ),
-            ChatMessage(
-                session_id=session.id,
-                role="assistant",
-                content="I'd be happy to help! Can you describe the specific issue you're experiencing?"
-            ),
-            ChatMessage(
-                session_id=session.id,
-                role="user",
-                content="Users are getting 'Invalid credentials' even with correct passwords"
-            ),
-            ChatMessage(
+        async with async_session.begin():
+            # Create chat session
+            session = ChatSession(
+                user_id=test_user.id,
+                title="Problem Solving Session",
+                settings={"model": "test_model", "temperature": 0.7}
+            )
+            async_session.add(session)
+            # Flush once for the session's primary key; everything else is
+            # committed together when the block exits
+            await async_session.flush()
+            
+            # Add messages to the conversation
+            messages = [
+                ChatMessage(
+                    session_id=session.id,
+                    role="user",
+                    content="I need help fixing a bug in my authentication system"
+                ),
+                ChatMessage(
+                    session_id=session.id,
+                    role="assistant",
+                    content="I'd be happy to help! Can you describe the specific issue you're experiencing?"
+                ),
+                ChatMessage(
+                    session_id=session.id,
+                    role="user",
+                    content="Users are getting 'Invalid credentials' even with correct passwords"
+                ),
+                ChatMessage(
+                    session_id=session.id,
+                    role="assistant", 
+                    content="Let's debug this step by step. First, let's check the password hashing logic.",
+                    model="test_model",
+                    tokens=45
+                )
+            ]
+            
+            # Create context based on the conversation
+            context = ChatContext(
                 session_id=session.id,
-                role="assistant", 
-                content="Let's debug this step by step. First, let's check the password hashing logic.",
-                model="test_model",
-                tokens=45
+                summary="User authentication system bug - invalid credentials error",
+                current_goal="Debug and fix password validation issue",
+                tasks=[
+                    {
+                        "id": "task-1",
+                        "description": "Check password hashing logic",
+                        "status": "pending",
+                        "priority": "high"
+                    },
+                    {
+                        "id": "task-2",
+                        "description": "Verify database user records",
+                        "status": "pending",
+                        "priority": "medium"
+                    },
+                    {
+                        "id": "task-3",
+                        "description": "Test login flow end-to-end",
+                        "status": "pending",
+                        "priority": "high"
+                    }
+                ],
+                relevant_documents=["auth_system.py", "user_model.py"]
             )
-        ]
-        
-        async_session.add_all(messages)
-        await async_session.commit()
-        
-        # Create context based on the conversation
-        context = ChatContext(
-            session_id=session.id,
-            summary="User authentication system bug - invalid credentials error",
-            current_goal="Debug and fix password validation issue",
-            tasks=[
-                {
-                    "id": "task-1",
-                    "description": "Check password hashing logic",
-                    "status": "pending",
-                    "priority": "high"
-                },
-                {
-                    "id": "task-2",
-                    "description": "Verify database user records",
-                    "status": "pending",
-                    "priority": "medium"
-                },
-                {
-                    "id": "task-3",
-                    "description": "Test login flow end-to-end",
-                    "status": "pending",
-                    "priority": "high"
-                }
-            ],
-            relevant_documents=["auth_system.py", "user_model.py"]
-        )
-        async_session.add(context)
-        await async_session.commit()
-        
-        # Update session stats
-        session.message_count = len(messages)
-        session.total_tokens = sum(msg.tokens or 0 for msg in messages)
-        session.last_message = "Let's debug this step by step..."
-        
-        await async_session.commit()
-        
-        # Verify complete workflow
+            async_session.add_all(messages + [context])
+            
+            # Update session stats
+            session.message_count = len(messages)
+            session.total_tokens = sum(msg.tokens or 0 for msg in messages)
+            session.last_message = "Let's debug this step by step..."
+        
+        # Verify complete workflow, loading all relationships in the same query
         result = await async_session.execute(
             select(ChatSession)
             .where(ChatSession.id == session.id)
+            .options(selectinload(ChatSession.messages), selectinload(ChatSession.context))
         )
         final_session = result.scalar_one()
         
-        # Load all relationships
-        await async_session.refresh(final_session, ['messages', 'context'])
-        
         # Verify session
         assert final_session.title == "Problem Solving Session"
         assert final_session.message_count == 4
@@ -590,59 +512,43 @@ class TestChatModelsIntegration:
     @pytest.mark.asyncio
     async def test_cascade_delete_complete_workflow(self, async_session, test_user):
         """Test that deleting a user cascades to all chat data"""
-        # Create complete chat structure
-        session = ChatSession(user_id=test_user.id, title="Test Session")
-        async_session.add(session)
-        await async_session.commit()
-        await async_session.refresh(session)
-        
-        message = ChatMessage(
-            session_id=session.id,
-            role="user", 
-            content="Test message"
-        )
-        async_session.add(message)
-        
-        context = ChatContext(
-            session_id=session.id,
-            summary="Test context"
-        )
-        async_session.add(context)
-        
-        await async_session.commit()
+        async with async_session.begin():
+            # Create complete chat structure
+            session = ChatSession(user_id=test_user.id, title="Test Session")
+            async_session.add(session)
+            await async_session.flush()
+            
+            message = ChatMessage(
+                session_id=session.id,
+                role="user", 
+                content="Test message"
+            )
+            context = ChatContext(
+                session_id=session.id,
+                summary="Test context"
+            )
+            async_session.add_all([message, context])
         
         # Verify everything exists
-        sessions_result = await async_session.execute(
-            select(ChatSession).where(ChatSession.user_id == test_user.id)
-        )
-        assert len(sessions_result.scalars().all()) == 1
+        sessions_count = await async_session.scalar(_COUNT_SESSIONS_BY_USER, {"user_id": test_user.id})
+        assert sessions_count == 1
         
-        messages_result = await async_session.execute(
-            select(ChatMessage).where(ChatMessage.session_id == session.id)
-        )
-        assert len(messages_result.scalars().all()) == 1
+        messages_count = await async_session.scalar(_COUNT_MESSAGES_BY_SESSION, {"session_id": session.id})
+        assert messages_count == 1
         
-        context_result = await async_session.execute(
-            select(ChatContext).where(ChatContext.session_id == session.id)
-        )
-        assert len(context_result.scalars().all()) == 1
+        context_count = await async_session.scalar(_COUNT_CONTEXTS_BY_SESSION, {"session_id": session.id})
+        assert context_count == 1
         
         # Delete the user
-        await async_session.delete(test_user)
+        await async_session.delete(await async_session.get(User, test_user.id))
         await async_session.commit()
         
         # Verify cascade deletion worked
-        sessions_result = await async_session.execute(
-            select(ChatSession).where(ChatSession.user_id == test_user.id)
-        )
-        assert len(sessions_result.scalars().all()) == 0
+        sessions_count = await async_session.scalar(_COUNT_SESSIONS_BY_USER, {"user_id": test_user.id})
+        assert sessions_count == 0
         
-        messages_result = await async_session.execute(
-            select(ChatMessage).where(ChatMessage.session_id == session.id)
-        )
-        assert len(messages_result.scalars().all()) == 0
+        messages_count = await async_session.scalar(_COUNT_MESSAGES_BY_SESSION, {"session_id": session.id})
+        assert messages_count == 0
         
-        context_result = await async_session.execute(
-            select(ChatContext).where(ChatContext.session_id == session.id)
-        )
-        assert len(context_result.scalars().all()) == 0
\ No newline at end of file
+        context_count = await async_session.scalar(_COUNT_CONTEXTS_BY_SESSION, {"session_id": session.id})
+        assert context_count == 0
\ No newline at end of file
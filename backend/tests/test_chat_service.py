@@ -4,24 +4,67 @@ from unittest.mock import Mock, AsyncMock, patch
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.services.chat_service import ChatService
+from app.services.chat_service import ChatService, _coalesce
 from app.models.chat import ChatSession, ChatMessage, ChatContext
 from app.schemas.chat import ChatSessionCreate, ChatMessageCreate, ChatSettings, StreamingResponse
 
 
+class _CallRecorder:
+    """Callable that records its calls, with the Mock assertions these tests use"""
+    
+    __slots__ = ("calls", "return_value")
+    
+    def __init__(self, return_value=None):
+        self.calls = []
+        self.return_value = return_value
+    
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.return_value
+    
+    def assert_called(self):
+        assert self.calls, "expected a call"
+    
+    def assert_called_once(self):
+        assert len(self.calls) == 1, f"expected 1 call, got {len(self.calls)}"
+    
+    def assert_called_once_with(self, *args, **kwargs):
+        self.assert_called_once()
+        assert self.calls[0] == (args, kwargs), f"called with {self.calls[0]}"
+    
+    def assert_not_called(self):
+        assert not self.calls, f"expected no calls, got {len(self.calls)}"
+
+
+class _AsyncCallRecorder(_CallRecorder):
+    """Awaitable variant of _CallRecorder"""
+    
+    __slots__ = ()
+    
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.return_value
+
+
+class StubAsyncSession:
+    """Stand-in for the AsyncSession methods ChatService calls"""
+    
+    __slots__ = ("add", "commit", "refresh", "delete", "execute")
+    
+    def __init__(self):
+        self.add = _CallRecorder()
+        self.commit = _AsyncCallRecorder()
+        self.refresh = _AsyncCallRecorder()
+        self.delete = _AsyncCallRecorder()
+        self.execute = _AsyncCallRecorder()
+
+
 @pytest.fixture
 def mock_db_session():
-    """Mock database session for testing"""
-    session = Mock(spec=AsyncSession)
-    session.add = Mock()
-    session.commit = AsyncMock()
-    session.refresh = AsyncMock()
-    session.delete = AsyncMock()
-    session.execute = AsyncMock()
-    return session
+    """Stub database session for testing"""
+    return StubAsyncSession()
 
 
 @pytest.fixture
@@ -59,6 +102,12 @@ def sample_chat_message():
     )
 
 
+@pytest.fixture
+def existing_session(request, sample_chat_session):
+    """What get_session finds: the sample session when param is True, otherwise None"""
+    return sample_chat_session if request.param else None
+
+
 class TestChatService:
     """Test cases for ChatService"""
     
@@ -79,47 +128,33 @@ class TestChatService:
         mock_db_session.refresh.assert_called_once()
     
     @pytest.mark.asyncio
-    async def test_get_session_exists(self, mock_db_session, mock_context_manager, sample_chat_session):
-        """Test getting an existing chat session"""
+    @pytest.mark.parametrize("existing_session", [True, False], ids=["exists", "not_exists"], indirect=True)
+    async def test_get_session(self, mock_db_session, mock_context_manager, existing_session):
+        """Test getting an existing and a non-existent chat session"""
         service = ChatService(mock_db_session, mock_context_manager)
         
         # Mock database query result
         mock_result = Mock()
-        mock_result.scalar_one_or_none.return_value = sample_chat_session
+        mock_result.scalar_one_or_none.return_value = existing_session
         mock_db_session.execute.return_value = mock_result
         
-        result = await service.get_session(sample_chat_session.id, user_id=1)
+        result = await service.get_session("test-session-id", user_id=1)
         
-        assert result == sample_chat_session
+        assert result is existing_session
         mock_db_session.execute.assert_called_once()
     
-    @pytest.mark.asyncio
-    async def test_get_session_not_exists(self, mock_db_session, mock_context_manager):
-        """Test getting a non-existent chat session"""
-        service = ChatService(mock_db_session, mock_context_manager)
-        
-        # Mock database query result
-        mock_result = Mock()
-        mock_result.scalar_one_or_none.return_value = None
-        mock_db_session.execute.return_value = mock_result
-        
-        result = await service.get_session("non-existent-id", user_id=1)
-        
-        assert result is None
-    
     @pytest.mark.asyncio
     async def test_add_message(self, mock_db_session, mock_context_manager, sample_chat_session):
         """Test adding a message to a chat session"""
         service = ChatService(mock_db_session, mock_context_manager)
+        message_data = ChatMessageCreate(
+            content="Test message",
+            settings=ChatSettings(),
+            context_options={}
+        )
         
         # Mock get_session to return our sample session
         with patch.object(service, 'get_session', return_value=sample_chat_session):
-            message_data = ChatMessageCreate(
-                content="Test message",
-                settings=ChatSettings(),
-                context_options={}
-            )
-            
             result = await service.add_message(
                 session_id=sample_chat_session.id,
                 user_id=1,
@@ -134,17 +169,15 @@ class TestChatService:
     
     @pytest.mark.asyncio
     async def test_add_message_session_not_found(self, mock_db_session, mock_context_manager):
-        """Test adding a message when session doesn't exist"""
+        """Test adding a message when the session doesn't exist"""
         service = ChatService(mock_db_session, mock_context_manager)
+        message_data = ChatMessageCreate(
+            content="Test message",
+            settings=ChatSettings(),
+            context_options={}
+        )
         
-        # Mock get_session to return None
         with patch.object(service, 'get_session', return_value=None):
-            message_data = ChatMessageCreate(
-                content="Test message",
-                settings=ChatSettings(),
-                context_options={}
-            )
-            
             with pytest.raises(ValueError, match="Session .* not found or access denied"):
                 await service.add_message("non-existent-id", 1, message_data)
     
@@ -170,29 +203,25 @@ class TestChatService:
         assert result[1].title == "Session 2"
     
     @pytest.mark.asyncio
-    async def test_delete_session(self, mock_db_session, mock_context_manager, sample_chat_session):
-        """Test deleting a chat session"""
+    @pytest.mark.parametrize(
+        "existing_session, expected_result, expected_deletes",
+        [(True, True, 1), (False, False, 0)],
+        ids=["exists", "not_exists"],
+        indirect=["existing_session"]
+    )
+    async def test_delete_session(
+        self, mock_db_session, mock_context_manager, existing_session, expected_result, expected_deletes
+    ):
+        """Test deleting a chat session, and a non-existent one"""
         service = ChatService(mock_db_session, mock_context_manager)
         
-        # Mock get_session to return our sample session
-        with patch.object(service, 'get_session', return_value=sample_chat_session):
-            result = await service.delete_session(sample_chat_session.id, user_id=1)
-            
-            assert result is True
-            mock_db_session.delete.assert_called_once_with(sample_chat_session)
-            mock_db_session.commit.assert_called_once()
-    
-    @pytest.mark.asyncio
-    async def test_delete_session_not_found(self, mock_db_session, mock_context_manager):
-        """Test deleting a non-existent session"""
-        service = ChatService(mock_db_session, mock_context_manager)
+        # Mock get_session to return our sample session, or None
+        with patch.object(service, 'get_session', return_value=existing_session):
+            result = await service.delete_session("test-session-id", user_id=1)
         
-        # Mock get_session to return None
-        with patch.object(service, 'get_session', return_value=None):
-            result = await service.delete_session("non-existent-id", user_id=1)
-            
-            assert result is False
-            mock_db_session.delete.assert_not_called()
+        assert result is expected_result
+        assert mock_db_session.delete.calls == [((existing_session,), {})] * expected_deletes
+        assert mock_db_session.commit.calls == [((), {})] * expected_deletes
     
     @pytest.mark.asyncio
     async def test_get_session_messages(self, mock_db_session, mock_context_manager):
@@ -333,13 +362,53 @@ class TestChatServiceStreaming:
             async for response in service.stream_chat_response(sample_chat_session.id, 1, message_data):
                 responses.append(response)
             
-            assert len(responses) >= 3  # At least chunk + chunk + complete
-            assert any(r.type == "chunk" and r.content == "Hello" for r in responses)
-            assert any(r.type == "chunk" and r.content == " world!" for r in responses)
-            assert any(r.type == "complete" for r in responses)
+            # Adjacent chunks are coalesced before they are yielded
+            assert "".join(r.content for r in responses if r.type == "chunk") == "Hello world!"
+            assert responses[-1].type == "complete"
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_merges_adjacent_chunks(self):
+        """Test that chunks are merged and other events flush the buffer in order"""
+        async def stream():
+            yield StreamingResponse(type="chunk", content="Hello")
+            yield StreamingResponse(type="chunk", content=" world!")
+            yield StreamingResponse(type="error", content="", error="boom")
+        
+        responses = [r async for r in _coalesce(stream())]
+        
+        assert [(r.type, r.content) for r in responses] == [("chunk", "Hello world!"), ("error", "")]
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_awaits_upstream_directly_when_buffer_empty(self):
+        """Test that no task is spawned per event while nothing is buffered"""
+        async def stream():
+            for _ in range(3):
+                yield StreamingResponse(type="error", content="", error="boom")
+        
+        with patch("app.services.chat_service.asyncio.ensure_future") as ensure_future:
+            responses = [r async for r in _coalesce(stream())]
+        
+        assert len(responses) == 3
+        ensure_future.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_coalesce_flushes_on_size_and_time(self):
+        """Test that the buffer is flushed at max_chars and after max_ms of silence"""
+        async def stream():
+            for token in ("ab", "cd", "ef"):
+                yield StreamingResponse(type="chunk", content=token)
+            await asyncio.sleep(0.05)
+            yield StreamingResponse(type="chunk", content="gh")
+            yield StreamingResponse(type="complete", content="")
+        
+        responses = [r async for r in _coalesce(stream(), max_chars=4, max_ms=10)]
+        
+        assert [r.content for r in responses if r.type == "chunk"] == ["abcd", "ef", "gh"]
+        assert responses[-1].type == "complete"
 
 
 @pytest.mark.asyncio
+@pytest.mark.xdist_group("chat_integration")
 class TestChatServiceIntegration:
     """Integration tests for ChatService with real database operations"""
     
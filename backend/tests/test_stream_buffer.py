@@ -0,0 +1,118 @@
+import pytest
+import asyncio
+
+from app.services.stream_buffer import AdaptiveBatcher, bounded_generator
+
+
+class TestAdaptiveBatcher:
+    """Test cases for AdaptiveBatcher"""
+
+    def test_batch_size_grows_to_max(self):
+        """Test that batches start at one token and grow geometrically"""
+        batcher = AdaptiveBatcher(min_batch_size=1, max_batch_size=50, batch_size_growth_factor=3.0)
+
+        batch_lengths = []
+        for _ in range(100):
+            batch = batcher.add("x")
+            if batch:
+                batch_lengths.append(len(batch))
+
+        assert batch_lengths == [1, 3, 9, 27, 50]
+        assert batcher.flush() == "x" * 10
+
+    def test_flush_empty_buffer(self):
+        """Test flushing with nothing buffered"""
+        batcher = AdaptiveBatcher()
+
+        assert batcher.flush() is None
+
+    def test_max_batch_size_one_disables_batching(self):
+        """Test that max_batch_size=1 emits every token as-is"""
+        batcher = AdaptiveBatcher(max_batch_size=1)
+
+        assert [batcher.add(token) for token in ["Hello", " ", "world"]] == ["Hello", " ", "world"]
+
+    def test_batching_disabled_by_default(self):
+        """Test that tokens pass through unbatched unless batching is requested"""
+        batcher = AdaptiveBatcher.from_kwargs({})
+
+        assert [batcher.add(token) for token in ["Hello", " ", "world"]] == ["Hello", " ", "world"]
+        assert batcher.flush() is None
+
+    def test_from_kwargs_pops_batching_options(self):
+        """Test that batching options are removed from provider kwargs"""
+        kwargs = {"max_batch_size": 10, "batch_size_growth_factor": 2.0, "top_p": 0.9}
+
+        batcher = AdaptiveBatcher.from_kwargs(kwargs)
+
+        assert kwargs == {"top_p": 0.9}
+        assert batcher.max_batch_size == 10
+        assert batcher.batch_size_growth_factor == 2.0
+
+
+class TestBoundedGenerator:
+    """Test cases for bounded_generator"""
+
+    @pytest.mark.asyncio
+    async def test_preserves_order(self):
+        """Test that all items are re-yielded in order"""
+        async def source():
+            for i in range(100):
+                yield i
+
+        items = [item async for item in bounded_generator(source(), max_in_flight=4)]
+
+        assert items == list(range(100))
+
+    @pytest.mark.asyncio
+    async def test_producer_pauses_for_slow_consumer(self):
+        """Test that the producer runs at most max_in_flight items ahead"""
+        produced = []
+
+        async def source():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        stream = bounded_generator(source(), max_in_flight=4)
+        first = await stream.__anext__()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert first == 0
+        # One item consumed, four queued, one blocked in put()
+        assert len(produced) <= 6
+        await stream.aclose()
+
+    @pytest.mark.asyncio
+    async def test_producer_runs_ahead_of_slow_consumer(self):
+        """Test that the producer keeps filling the buffer while the consumer is busy"""
+        produced = []
+        
+        async def source():
+            for i in range(10):
+                produced.append(i)
+                yield i
+        
+        stream = bounded_generator(source(), max_in_flight=64)
+        first = await stream.__anext__()
+        # Simulate a slow write to the client
+        await asyncio.sleep(0.01)
+        
+        assert first == 0
+        assert produced == list(range(10))
+        assert [item async for item in stream] == list(range(1, 10))
+    
+    @pytest.mark.asyncio
+    async def test_source_error_propagates(self):
+        """Test that exceptions from the source reach the consumer"""
+        async def source():
+            yield "partial"
+            raise ConnectionError("Network connection lost")
+
+        items = []
+        with pytest.raises(ConnectionError):
+            async for item in bounded_generator(source()):
+                items.append(item)
+
+        assert items == ["partial"]